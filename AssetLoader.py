@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import pygame
+
+cacheDir = 'assets/cache' # baked atlases are stored here
+
+# images packed together into one prebaked atlas per sheet
+# each source is either scaled to a size or, when size is None, trimmed to its visible area
+sheets = {
+    'player': [('assets/player/'+str(i)+'.png', (75, 100)) for i in range(12)], # player animation
+    'shipLasers': [('assets/images/shipLaser'+str(i)+'.png', None) for i in range(1,5)], # moving ship's lasers
+}
+
+# packs rectangle sizes into rows, returns positions and atlas size
+def pack(sizes, maxWidth=2048):
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1]) # tallest first keeps rows tight
+    positions = [None]*len(sizes)
+    x = y = rowHeight = width = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w > maxWidth and x > 0: # start new row
+            y += rowHeight
+            x = rowHeight = 0
+        positions[i] = (x, y)
+        x += w
+        rowHeight = max(rowHeight, h)
+        width = max(width, x)
+    return positions, (width, y + rowHeight)
+
+# path of a sheet's atlas image and index
+def atlasPaths(name):
+    return os.path.join(cacheDir, name+'.png'), os.path.join(cacheDir, name+'.json')
+
+# checks if a sheet needs baking again because the atlas is missing or older than a source
+def isStale(name):
+    image, index = atlasPaths(name)
+    if not os.path.exists(image) or not os.path.exists(index):
+        return True
+    baked = min(os.path.getmtime(image), os.path.getmtime(index))
+    return any(os.path.getmtime(path) > baked for path, size in sheets[name])
+
+# scales or trims every source of a sheet, packs them and saves the atlas with its index
+def bake(name):
+    images = [] # prepared images
+    offsets = [] # position of each trimmed image within its source
+    for path, size in sheets[name]:
+        image = pygame.image.load(path)
+        if size: # scale to final size
+            images.append(pygame.transform.scale(image, size))
+            offsets.append((0, 0))
+        else: # trim to visible area
+            bounds = image.get_bounding_rect()
+            images.append(image.subsurface(bounds).copy())
+            offsets.append(bounds.topleft)
+    positions, size = pack([image.get_size() for image in images])
+    atlas = pygame.Surface(size, pygame.SRCALPHA, 32)
+    for image, pos in zip(images, positions):
+        atlas.blit(image, pos)
+
+    os.makedirs(cacheDir, exist_ok=True)
+    image, index = atlasPaths(name)
+    pygame.image.save(atlas, image)
+    frames = [[pos[0], pos[1], img.get_width(), img.get_height(), off[0], off[1]] for img, pos, off in zip(images, positions, offsets)]
+    with open(index, 'w') as f:
+        json.dump({'frames': frames}, f)
+
+# loads images on demand and records how long each one took
+class Assets:
+    def __init__(self, report=False):
+        self.report = report # print each load as it happens
+        self.times = [] # (name, seconds) of every load
+        self.sheets = {} # loaded sheets by name
+
+    # records time of a load
+    def timed(self, name, start):
+        took = time.perf_counter() - start
+        self.times.append((name, took))
+        if self.report:
+            print('%-36s %7.1f ms' % (name, took*1000))
+
+    # loads a single image
+    def image(self, path):
+        start = time.perf_counter()
+        image = pygame.image.load(path).convert_alpha()
+        self.timed(path, start)
+        return image
+
+    # gets a sheet as a list of (image, offset) pairs, baking its atlas first if needed
+    def sheet(self, name):
+        if name not in self.sheets:
+            start = time.perf_counter()
+            if isStale(name):
+                bake(name)
+                self.timed('bake '+name, start)
+                start = time.perf_counter()
+            image, index = atlasPaths(name)
+            atlas = pygame.image.load(image).convert_alpha()
+            with open(index) as f:
+                frames = json.load(f)['frames']
+            self.sheets[name] = [(atlas.subsurface((x, y, w, h)), (ox, oy)) for x, y, w, h, ox, oy in frames]
+            self.timed('atlas '+name, start)
+        return self.sheets[name]
+
+    # total time spent loading
+    def total(self):
+        return sum(took for name, took in self.times)
+
+# bakes every sheet, run from the game folder after changing images
+if __name__ == '__main__':
+    for name in sheets:
+        start = time.perf_counter()
+        bake(name)
+        print('baked %s in %.1f ms' % (name, (time.perf_counter()-start)*1000))
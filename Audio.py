@@ -0,0 +1,65 @@
+import time
+import threading
+import pygame
+
+tracks = {'menu': 'assets/music/menu.ogg', 'game': 'assets/music/game.ogg'} # looping music of each screen
+fadeTime = 0.6 # seconds a crossfade between tracks takes
+duckVolume = 0.1 # music volume while paused
+
+# plays screen music from tracks decoded once by a background thread
+# two reserved channels take turns so switching tracks crossfades without stopping the frame
+# volumes are set by update every frame rather than by SDL fades, which would undo ducking
+class Audio:
+    def __init__(self, enabled=True):
+        self.enabled = enabled and pygame.mixer.get_init() is not None # no mixer means no music
+        self.sounds = {} # decoded tracks by name, filled in by the loader
+        self.playing = None # name of track playing
+        self.channel = None # channel playing it
+        self.fading = None # channel of previous track while it fades out
+        self.fadeStart = 0 # when the last switch began
+        self.volume = 1 # music volume, lowered while ducked
+        if self.enabled:
+            pygame.mixer.set_reserved(2) # sound effects never take the music channels
+            self.channels = [pygame.mixer.Channel(0), pygame.mixer.Channel(1)]
+            self.loader = threading.Thread(target=self.load, daemon=True) # reads and decodes tracks off the frame
+            self.loader.start()
+
+    # decodes every track, a missing track stays silent
+    def load(self):
+        for name, path in tracks.items():
+            try:
+                self.sounds[name] = pygame.mixer.Sound(path)
+            except (pygame.error, OSError) as error:
+                print('music not loaded:', path, error)
+
+    # plays a track looped, fading out the one before, cheap to call every frame
+    # a track still being decoded starts on the first call after it is ready
+    def play(self, name):
+        if not self.enabled or self.playing == name or name not in self.sounds:
+            return
+        channel = self.channels[1] if self.channel is self.channels[0] else self.channels[0]
+        channel.set_volume(0)
+        channel.play(self.sounds[name], loops=-1)
+        self.fading = self.channel
+        self.channel = channel
+        self.playing = name
+        self.fadeStart = time.perf_counter()
+        self.update()
+
+    # sets volumes of the crossfade, called every frame
+    def update(self):
+        if self.channel is None:
+            return
+        done = min((time.perf_counter() - self.fadeStart) / fadeTime, 1) # share of the crossfade passed
+        self.channel.set_volume(self.volume * done)
+        if self.fading is not None:
+            if done < 1:
+                self.fading.set_volume(self.volume * (1-done))
+            else:
+                self.fading.stop()
+                self.fading = None
+
+    # lowers music while paused, back to full volume at once when resumed
+    def duck(self, ducked):
+        self.volume = duckVolume if ducked else 1
+        self.update()
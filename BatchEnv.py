@@ -0,0 +1,208 @@
+import os, sys
+import time
+import random
+from multiprocessing import Pool
+import numpy as np
+from LevelFuzzer import level
+from Simulation import Simulation, jumpPress, jumpRelease, platBuffer, platGaps, platWidths, runSpeed, tickRate
+
+playerX = 100 # screen x where player touches platforms
+groundY = 428 # player y when standing on a platform
+
+# many independent games stepped in lockstep as arrays, follows the rules of Simulation and Player
+# each game keeps a ring of platforms as world positions, scrolling adds to its camera offset
+# levels come from numpy's generator, so a seed gives different levels than Simulation's
+class BatchEnv:
+    def __init__(self, games, lookahead=platBuffer, seed=None):
+        self.games = games # amount of games
+        self.lookahead = max(lookahead, platBuffer) # platforms kept per game
+        self.rng = np.random.default_rng(seed) # level generator
+        self.starts = np.zeros((games, self.lookahead), np.int64) # world x where each platform begins
+        self.ends = np.zeros((games, self.lookahead), np.int64) # world x where each platform ends
+        self.lastEnd = np.zeros(games, np.int64) # end of furthest platform
+        self.scroll = np.zeros(games, np.int64) # world distance scrolled
+        self.y = np.zeros(games, np.int64) # player y
+        self.moveY = np.zeros(games) # player rate of moving on y axis
+        self.jumping = np.zeros(games, bool) # player in air after jumping
+        self.holding = np.zeros(games, bool) # jump key held
+        self.dead = np.zeros(games, bool) # player fell
+        self.gap = np.zeros(games, bool) # player is over a gap
+        self.score = np.zeros(games, np.int64) # gaps passed
+        self.deathTicks = np.zeros(games, np.int64) # ticks since player died
+        self.ticks = np.zeros(games, np.int64) # ticks since reset
+        self.reset()
+
+    # restarts games given by a boolean mask, all when None, returns observations
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.games, bool)
+        count = int(mask.sum())
+        if count == 0:
+            return self.observe()
+        self.scroll[mask] = 0
+        for k in range(self.lookahead):
+            if k < platBuffer: # flat opening platforms back to back
+                self.starts[mask, k] = 400*k
+                self.ends[mask, k] = 400*(k+1)
+            else:
+                self.starts[mask, k] = self.ends[mask, k-1] + self.rng.integers(platGaps[0], platGaps[1]+1, count)
+                self.ends[mask, k] = self.starts[mask, k] + self.rng.integers(platWidths[0], platWidths[1]+1, count)
+        self.lastEnd[mask] = self.ends[mask, -1]
+        self.y[mask] = groundY
+        self.moveY[mask] = 0
+        self.jumping[mask] = False
+        self.holding[mask] = False
+        self.dead[mask] = False
+        self.gap[mask] = False
+        self.score[mask] = 0
+        self.deathTicks[mask] = 0
+        self.ticks[mask] = 0
+        return self.observe()
+
+    # moves platforms that passed left of screen to the end with random size and spacing
+    def refill(self):
+        for k in range(self.lookahead):
+            passed = self.ends[:, k] - self.scroll < 0
+            count = int(passed.sum())
+            if count:
+                starts = self.lastEnd[passed] + self.rng.integers(platGaps[0], platGaps[1]+1, count)
+                self.starts[passed, k] = starts
+                self.ends[passed, k] = starts + self.rng.integers(platWidths[0], platWidths[1]+1, count)
+                self.lastEnd[passed] = self.ends[passed, k]
+
+    # advances every game one tick, actions says if each player holds jump
+    # returns observations, score gained and which games ended, ended games are reset
+    def step(self, actions):
+        actions = np.asarray(actions, bool)
+        press = actions & ~self.holding
+        jump = press & ~self.jumping & ~self.dead
+        self.moveY[jump] = -10
+        self.jumping |= jump
+        self.holding = actions.copy()
+        self.deathTicks += self.dead
+
+        self.refill()
+        self.scroll += runSpeed
+
+        x = playerX + self.scroll[:, None]
+        gap = ~((self.starts < x) & (self.ends >= x)).any(axis=1)
+        reward = (gap & ~self.gap).astype(np.int64)
+        self.score += reward
+        self.gap = gap
+
+        # player update, y is rounded like pygame Rect stores it
+        self.y = np.floor(self.y + self.moveY + 0.5).astype(np.int64)
+        grav = np.where(self.holding & (self.moveY < 0), 0.25, 0.55)
+        air = (gap | self.jumping) & ~self.dead
+        self.moveY[air] += grav[air]
+        landed = air & (self.y >= groundY)
+        fell = landed & gap
+        stood = landed & ~gap
+        self.moveY[fell] = 10
+        self.dead |= fell
+        self.y[stood] = groundY
+        self.moveY[stood] = 0
+        self.jumping &= ~landed
+        np.minimum(self.moveY, 10, out=self.moveY)
+        self.ticks += 1
+
+        done = self.dead & (self.deathTicks >= tickRate)
+        scores = self.score[done].copy() # final scores of ended games
+        obs = self.reset(done) if done.any() else self.observe()
+        return obs, reward, done, scores
+
+    # per game: player y, rate of moving on y, jumping, distance to next gap and its width
+    # over a gap the distance is 0 and the width is what is left of it
+    def observe(self):
+        x = playerX + self.scroll[:, None]
+        big = np.iinfo(np.int64).max
+        covered = ((self.starts < x) & (self.ends >= x)).any(axis=1)
+        ahead = np.where(self.starts >= x, self.starts, big).min(axis=1) # next platform beginning
+        coverEnd = np.where(self.ends >= x, self.ends, big).min(axis=1) # end of platform under player
+        x = x[:, 0]
+        distance = np.where(covered, coverEnd - x, 0)
+        width = np.where(covered, ahead - coverEnd, ahead - x)
+        return np.stack([self.y, self.moveY, self.jumping, distance, width], axis=1).astype(np.float64)
+
+# holds jump from a little before a gap until the top of the jump
+def gapPolicy(obs, lead=48):
+    y, moveY, jumping, distance, width = obs.T
+    start = (jumping == 0) & (distance <= lead) & (width > 0)
+    rising = (jumping == 1) & (moveY < 0)
+    return start | rising
+
+# runs a share of games in one process, returns final scores of episodes that ended
+def runShare(args):
+    games, ticks, seed, lookahead, policy = args
+    env = BatchEnv(games, lookahead, seed)
+    obs = env.observe()
+    scores = []
+    for tick in range(ticks):
+        obs, reward, done, ended = env.step(policy(obs))
+        scores.extend(ended.tolist())
+    return scores
+
+# runs games split across a process pool, policy must be a module level function so it can be pickled
+def runParallel(games, ticks, workers=None, seed=0, lookahead=platBuffer, policy=gapPolicy):
+    workers = workers or os.cpu_count()
+    with Pool(workers) as pool:
+        shares = [games//workers + (1 if i < games%workers else 0) for i in range(workers)]
+        jobs = [(share, ticks, seed+i, lookahead, policy) for i, share in enumerate(shares) if share > 0]
+        scores = []
+        for result in pool.map(runShare, jobs):
+            scores.extend(result)
+    return scores
+
+# plays the same level in Simulation and a one game BatchEnv and compares them every tick until the run ends
+# even seeds follow gapPolicy to get far into the level, odd seeds hold jump at random
+# returns None when they agree, otherwise the first tick and what differed
+def checkSeed(seed, ticks=3000):
+    sim = Simulation(seed=seed)
+    env = BatchEnv(1, ticks*runSpeed // (platWidths[0]+platGaps[0]) + platBuffer + 1) # room for the whole run, refills never come into view
+    plats = level(seed, env.lookahead - platBuffer)
+    env.starts[0] = [start for start, end in plats]
+    env.ends[0] = [end for start, end in plats]
+    env.lastEnd[0] = plats[-1][1]
+    rng = random.Random(seed)
+    obs = env.observe()
+    holding = False
+    for tick in range(ticks):
+        hold = bool(gapPolicy(obs)[0]) if seed % 2 == 0 else (holding != (rng.random() < 0.1))
+        sim.step([jumpPress] if hold and not holding else [jumpRelease] if holding and not hold else [])
+        holding = hold
+        obs, reward, done, scores = env.step([hold])
+        player = sim.player
+        if done[0] or sim.isOver():
+            if done[0] != sim.isOver() or scores[0] != sim.score:
+                return tick, 'end', (bool(done[0]), scores.tolist()), (sim.isOver(), sim.score)
+            return None
+        ours = (int(env.y[0]), float(env.moveY[0]), bool(env.jumping[0]), bool(env.dead[0]), int(env.score[0]))
+        theirs = (player.rect.y, float(player.move_y), player.jumping, player.dead, sim.score)
+        if ours != theirs:
+            return tick, 'y, move y, jumping, dead, score', ours, theirs
+    return None
+
+# checks BatchEnv still follows Simulation's rules on many seeds, returns seeds that differed with their first difference
+def check(seeds=40, ticks=3000):
+    return [(seed, found) for seed in range(seeds) for found in [checkSeed(seed, ticks)] if found is not None]
+
+# python BatchEnv.py games ticks [workers], plays games with gapPolicy and reports throughput
+# python BatchEnv.py --check [seeds], compares BatchEnv with Simulation on seeded levels
+if __name__ == '__main__':
+    if '--check' in sys.argv:
+        at = sys.argv.index('--check')
+        seeds = int(sys.argv[at+1]) if len(sys.argv) > at+1 else 40
+        differed = check(seeds)
+        for seed, found in differed:
+            print('seed %d differs on tick %d in %s: BatchEnv %s, Simulation %s' % ((seed,) + found))
+        print('%d seeds checked, %d differ' % (seeds, len(differed)))
+        sys.exit(1 if differed else 0)
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    start = time.perf_counter()
+    scores = runParallel(games, ticks, workers)
+    took = time.perf_counter() - start
+    print('%d games x %d ticks in %.2f s (%.0f game ticks/s)' % (games, ticks, took, games*ticks/took))
+    if scores:
+        print('%d episodes ended, mean score %.2f, best %d' % (len(scores), np.mean(scores), max(scores)))
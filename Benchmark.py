@@ -0,0 +1,199 @@
+import os, sys
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # no window, runs on machines without a display
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+import json
+import time
+import argparse
+import platform
+import statistics
+import tracemalloc
+import pygame
+from Game import Main
+from Simulation import jumpPress, jumpRelease
+
+benchSeed = 1234 # every benchmark plays the same level
+warmup = 60 # frames run before measuring, lazy assets load during these
+idleWait = 1 # milliseconds a benchmarked pause frame waits for input, the game waits up to idleTimeout
+
+# jumps just before a gap and holds until the top of the jump, keeps gameplay going
+def autopilot(sim):
+    player = sim.player
+    if not player.jumping and not player.dead and sim.platforms.under(148) is None:
+        return [jumpPress]
+    if player.holding and player.move_y >= 0:
+        return [jumpRelease]
+    return []
+
+# wraps a function so its time is added to the renderer's stage times while measuring
+def timed(main, name, function):
+    def wrapper(*args):
+        stages = main.renderer.stageTimes
+        if stages is None: # not measuring
+            return function(*args)
+        start = time.perf_counter()
+        result = function(*args)
+        stages[name] = stages.get(name, 0) + time.perf_counter() - start
+        return result
+    return wrapper
+
+# percentiles of a list of seconds, in milliseconds
+def summary(samples):
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {'p50': cuts[49]*1000, 'p95': cuts[94]*1000, 'p99': cuts[98]*1000}
+
+# game screens that are benchmarked, each sets up main and returns a function that draws one frame
+def menuState(main):
+    main.isMain = True
+    main.scenery.reseed(benchSeed)
+    def frame():
+        main.mainMenu(False,False,None)
+        main.renderer.present()
+    return frame
+
+def gameState(main):
+    main.isMain = False
+    main.startRun(benchSeed)
+    def frame():
+        if main.sim.isOver():
+            main.startRun(benchSeed)
+        main.inputs += autopilot(main.sim)
+        main.game()
+        main.renderer.present()
+    return frame
+
+# paused frames do what the game loop does while paused, wait for input then present a frame already on the display
+def pauseState(main):
+    main.isMain = False
+    main.startRun(benchSeed)
+    main.game()
+    main.setPaused(True)
+    main.pausedMenu(False,False,None) # drawn once, like the game loop does
+    main.renderer.present()
+    def frame():
+        stages = main.renderer.stageTimes
+        start = time.perf_counter()
+        pygame.event.wait(idleWait) # no input comes, so this is the timeout path
+        pygame.event.get()
+        if stages is not None:
+            stages['idle'] = time.perf_counter() - start
+        main.schedule(False)
+        main.audio.update()
+        main.renderer.present() # skipped, nothing changed
+    return frame
+
+states = {'menu': menuState, 'game': gameState, 'pause': pauseState}
+
+# runs frames of a state, returns per stage samples in seconds
+def measure(main, state, frames):
+    frame = states[state](main)
+    for i in range(warmup):
+        frame()
+    samples = {}
+    for i in range(frames):
+        stages = {}
+        main.renderer.stageTimes = stages # blit and display time of each stage
+        start = time.perf_counter()
+        frame()
+        stages['frame'] = time.perf_counter() - start
+        for name, took in stages.items():
+            samples.setdefault(name, []).append(took)
+    main.renderer.stageTimes = None
+    for name in samples: # stages missing from some frames count as zero there
+        samples[name] += [0.0]*(frames - len(samples[name]))
+    return samples
+
+# runs frames of a state again while tracing memory, returns peak kilobytes and net blocks allocated per frame
+def allocations(main, state, frames):
+    frame = states[state](main)
+    for i in range(warmup):
+        frame()
+    peaks = []
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    for i in range(frames):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        frame()
+        peaks.append((tracemalloc.get_traced_memory()[1] - current) / 1024)
+    tracemalloc.stop()
+    blocks = (sys.getallocatedblocks() - blocks) / frames
+    return {'peakKB': statistics.mean(peaks), 'peakKBMax': max(peaks), 'netBlocks': blocks}
+
+# benchmarks every state, returns results ready to be saved
+def run(frames, dirty, window=None, resolution=1):
+    main = Main(dirty=dirty, music=False, window=window, resolution=resolution) # music is not part of frame time, and is skipped
+    main.scenery.update = timed(main, 'scenery.update', main.scenery.update)
+    main.sim.step = timed(main, 'sim.step', main.sim.step)
+    main.drawScenery = timed(main, 'scenery', main.drawScenery) # queueing time joins drawing time of the stage
+    main.drawPlatforms = timed(main, 'platforms', main.drawPlatforms)
+    main.drawEntities = timed(main, 'entities', main.drawEntities)
+    main.displayScore = timed(main, 'score', main.displayScore)
+    main.drawPlayer = timed(main, 'player', main.drawPlayer)
+
+    results = {'meta': {
+        'python': platform.python_version(), 'pygame': pygame.version.ver, 'sdl': '.'.join(map(str, pygame.get_sdl_version())),
+        'machine': platform.machine(), 'system': platform.system(), 'frames': frames, 'seed': benchSeed,
+        'dirty': dirty, 'window': list(main.screen.get_size()), 'resolution': resolution, 'idleWait': idleWait, 'videodriver': os.environ['SDL_VIDEODRIVER'], 'time': time.time()},
+        'states': {}}
+    for state in states:
+        samples = measure(main, state, frames)
+        results['states'][state] = {
+            'fps': frames / sum(samples['frame']),
+            'stages': {name: summary(values) for name, values in sorted(samples.items())},
+            'allocations': allocations(main, state, frames)}
+    return results
+
+# prints results as a table
+def report(results):
+    for state, result in results['states'].items():
+        alloc = result['allocations']
+        print('%s: %.0f fps, %.1f KB peak allocated per frame, %.1f net blocks per frame' % (state, result['fps'], alloc['peakKB'], alloc['netBlocks']))
+        for name, cuts in result['stages'].items():
+            print('  %-16s p50 %7.3f ms  p95 %7.3f ms  p99 %7.3f ms' % (name, cuts['p50'], cuts['p95'], cuts['p99']))
+
+# stages of a saved baseline the new results do not have, the benchmark measures something else there now
+def missing(results, baseline):
+    gone = []
+    for state, result in baseline['states'].items():
+        for name in result.get('stages', {}):
+            if name not in results['states'].get(state, {}).get('stages', {}):
+                gone.append('%s %s' % (state, name))
+    return gone
+
+# compares p95 of every stage with a saved baseline, returns stages that got slower than tolerance
+def compare(results, baseline, tolerance):
+    slower = []
+    for state, result in results['states'].items():
+        for name, cuts in result['stages'].items():
+            old = baseline['states'].get(state, {}).get('stages', {}).get(name)
+            if old is None:
+                continue
+            if cuts['p95'] > old['p95']*(1+tolerance) and cuts['p95'] - old['p95'] > 0.05: # ignores noise under 50 microseconds
+                slower.append('%s %s p95 %.3f ms -> %.3f ms' % (state, name, old['p95'], cuts['p95']))
+    return slower
+
+# run from the game folder, python Benchmark.py --out new.json --compare baseline.json
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Frame time benchmark of menu, game and pause screens')
+    parser.add_argument('--frames', type=int, default=1000, help='measured frames per screen')
+    parser.add_argument('--dirty', action='store_true', help='use dirty rectangle rendering')
+    parser.add_argument('--window', help='window size like 3840x2160, the game is scaled to fit')
+    parser.add_argument('--resolution', type=float, default=1, help='internal resolution as a share of the window')
+    parser.add_argument('--out', default='benchmark.json', help='file results are saved to')
+    parser.add_argument('--compare', help='baseline results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed p95 slowdown, 0.10 is 10%%')
+    args = parser.parse_args()
+
+    results = run(args.frames, args.dirty, tuple(map(int, args.window.split('x'))) if args.window else None, args.resolution)
+    report(results)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        slower = compare(results, baseline, args.tolerance)
+        for line in missing(results, baseline):
+            print('not measured any more:', line)
+        for line in slower:
+            print('slower:', line)
+        sys.exit(1 if slower else 0)
@@ -0,0 +1,115 @@
+from collections import deque
+import pygame # only Rect is used
+
+cellSize = 128 # width and height of spatial hash cells in pixels
+kindColors = {'pickup': (230,230,80), 'obstacle': (200,40,40)} # drawing color of each entity kind
+
+# something on the level the player can touch, positions are world coordinates like platforms
+class Entity:
+    def __init__(self):
+        self.kind = None # what the entity is, decides what touching it does
+        self.rect = pygame.Rect(0, 0, 0, 0) # world position and size
+        self.active = False # in the level, inactive entities wait in the pool
+        self.cells = () # spatial hash cells it is stored in
+
+# uniform grid of cells, each holding the entities that overlap it
+# buckets are dicts so entities come back in the order they were added, keeping runs deterministic
+class SpatialHash:
+    def __init__(self, cell=cellSize):
+        self.cell = cell # cell size
+        self.cells = {} # (column, row) -> {entity: None}
+
+    # cells a rectangle overlaps
+    def span(self, rect):
+        c = self.cell
+        return [(x, y) for x in range(rect.left//c, (rect.right-1)//c + 1) for y in range(rect.top//c, (rect.bottom-1)//c + 1)]
+
+    # adds an entity to every cell it overlaps
+    def insert(self, entity):
+        entity.cells = self.span(entity.rect)
+        for key in entity.cells:
+            self.cells.setdefault(key, {})[entity] = None
+
+    # takes an entity out of its cells
+    def remove(self, entity):
+        for key in entity.cells:
+            bucket = self.cells[key]
+            del bucket[entity]
+            if not bucket: # empty cells are dropped so the grid only grows with live entities
+                del self.cells[key]
+        entity.cells = ()
+
+    # updates cells of an entity after its rect changed
+    def move(self, entity):
+        if self.span(entity.rect) != list(entity.cells):
+            self.remove(entity)
+            self.insert(entity)
+
+    # entities in cells a rectangle overlaps, they may not overlap the rectangle itself
+    def query(self, rect):
+        found = {}
+        for key in self.span(rect):
+            bucket = self.cells.get(key)
+            if bucket:
+                found.update(bucket)
+        return found
+
+    # removes every entity
+    def clear(self):
+        self.cells.clear()
+
+# entities of a run, found through a spatial hash and recycled through a pool
+# like platforms they should be spawned from left to right, those that passed left of screen go back to the pool
+class EntityLayer:
+    def __init__(self, cell=cellSize):
+        self.grid = SpatialHash(cell) # broad phase
+        self.order = deque() # entities in the order they were spawned, passed ones leave from the front
+        self.pool = [] # inactive entities ready for reuse
+        self.count = 0 # active entities
+
+    # amount of active entities
+    def __len__(self):
+        return self.count
+
+    # places an entity of kind at world rect, reusing a pooled one when possible
+    def spawn(self, kind, rect):
+        entity = self.pool.pop() if self.pool else Entity()
+        entity.kind = kind
+        entity.rect.update(rect)
+        entity.active = True
+        self.grid.insert(entity)
+        self.order.append(entity)
+        self.count += 1
+        return entity
+
+    # removes an entity from the level, its object is reused once it reaches the front of the spawn order
+    def kill(self, entity):
+        if entity.active:
+            entity.active = False
+            self.grid.remove(entity)
+            self.count -= 1
+
+    # recycles entities that ended left of the camera and killed ones behind them, returns how many passed
+    def dropPassed(self, scroll):
+        dropped = 0
+        while self.order and (not self.order[0].active or self.order[0].rect.right < scroll):
+            entity = self.order.popleft()
+            if entity.active:
+                self.kill(entity)
+                dropped += 1
+            self.pool.append(entity)
+        return dropped
+
+    # active entities overlapping a world rect, of the given kinds if set
+    def collide(self, rect, kinds=None):
+        return [entity for entity in self.grid.query(rect) if (kinds is None or entity.kind in kinds) and entity.rect.colliderect(rect)]
+
+    # every entity goes back to the pool
+    def clear(self):
+        for entity in self.order:
+            entity.active = False
+            entity.cells = ()
+            self.pool.append(entity)
+        self.order.clear()
+        self.grid.clear()
+        self.count = 0
@@ -1,227 +1,158 @@
 import sys, pygame
-import queue
-import random
+import io
 import time
-import shelve
-
-platBuffer = 5 # amount of platforms instantiated at once
-displayHeight = 720 # window height
-displayWidth = 1280 # window width
-runSpeed = 8 # movement speed
-
-pygame.init() # initialize pygame
-
-pygame.mixer.music.load('assets/music/menu.ogg') # load menu music
-screen = pygame.display.set_mode((displayWidth,displayHeight)) # screen
-title = pygame.image.load('assets/images/title.png').convert_alpha() # main menu title
-
-backgroundImage = pygame.image.load('assets/images/sky.png').convert_alpha() # background sky
-buildingsFar = pygame.image.load('assets/images/buildingsFar.png').convert_alpha() # further buildings
-buildingsClose = pygame.image.load('assets/images/buildingsClose.png').convert_alpha() # closer buildings
-lasersImage = pygame.image.load('assets/images/lasers.png').convert_alpha() # background lasers
-
-ship = pygame.image.load('assets/images/ship.png').convert_alpha() # moving ship
-shipLaser1 = pygame.image.load('assets/images/shipLaser1.png').convert_alpha() # moving ship laser
-shipLaser2 = pygame.image.load('assets/images/shipLaser2.png').convert_alpha() # moving ship laser
-shipLaser3 = pygame.image.load('assets/images/shipLaser3.png').convert_alpha() # moving ship laser
-shipLaser4 = pygame.image.load('assets/images/shipLaser4.png').convert_alpha() # moving ship laser
-
-clock = pygame.time.Clock() # used for framerate
-
-# platforms player jumps on
-class Platform():
-    # stores parameters as pygame rectangle
-    def __init__(self, x, y, width, height):
-        self.rect = pygame.Rect((x,y),(width,height))
-     
-    # draws black rectangle
-    def draw(self):
-        pygame.draw.rect(screen,(0,0,0), self.rect)
-        
-    # moves the rectangle and stores new position
-    def update(self):
-        self.rect = self.rect.move(-runSpeed,0)
-
-# player 
-class Player(pygame.sprite.Sprite):
-    def __init__(self):
-        super().__init__() # call parent constructor
-        self.jumping = False # on platform or in air
-        self.holding = False # holding jump key
-        self.dead = False # if player fell or not
-        self.groundDelay = 0.03 # ground animation speed 
-        self.airDelay = 0.1 # air animation speed
-        self.animDelay = self.groundDelay # initialize animation speed   
-        self.start = time.time() # initializes a timer
-        
-        self.images = [] # list to store player images
-        for i in range(12):
-            self.images.append(pygame.image.load('assets/player/'+str(i)+'.png').convert_alpha()) # append images
-            self.images[i] = pygame.transform.scale(self.images[i], (75, 100)) # scale images
-
-        self.rect = pygame.Rect(100, 428, 75, 100) # initialize player position
-        self.pIndex = 0 # initializes current sprite image index
-        self.move_x = 0 # rate of moving on x axis
-        self.move_y = 0 # rate of moving on y axis
-
-    # updates player traits, called with Group.update()
-    def update(self, gap):
-        self.rect.y += self.move_y # changes player y position
-        self.rect.x += self.move_x # changes player x position
-        if self.holding and self.move_y < 0: # if holding jump and moving upwards
-            self.gravity(gap, 0.25) # lower gravity 
-        else: # falling
-            self.gravity(gap, 0.55) # normal gravity
-
-        # set animation delay
-        if not self.jumping and not self.dead and self.animDelay != self.groundDelay: # moving on platform
-            self.animDelay = self.groundDelay
-        elif self.animDelay != self.airDelay: # moving in air
-            self.animDelay = self.airDelay
-                 
-        if time.time() - self.start >= self.animDelay: # animation speed
-            self.pIndex = (self.pIndex+1) % len(self.images) # changes to next image
-            self.start = time.time() # reset timer
-
-        self.image = self.images[self.pIndex] # sets current sprite image     
-
-    # sets gravity for different scenarios 
-    def gravity(self, gap, grav):
-        if (gap or self.jumping) and not self.dead: # if player is in the air 
-            self.move_y += grav # sets downward move rate
-            if self.rect.y >= 428: # if player is level or below top of platforms
-                if gap: # player is not on a platform 
-                    self.move_x = -runSpeed # player moves with platforms
-                    self.move_y = 10 # player falls fast
-                    self.dead = True # player is dead
-                else: # player is on platform
-                    self.rect.y = 428 # saftey, ensures player stays level with top of platforms
-                    self.move_y = 0 # not moving up or down
-                self.jumping = False # not jumping
-        if self.move_y > 10: # fall rate limit
-            self.move_y = 10
-
-    # adds upward movement rate when called
-    def jump(self):
-        if not self.jumping and not self.dead: # player is not currently jumping and not dead
-            self.move_y = -10 # sets rate of moving
-            self.jumping = True # sets jump state as true when called
-
-    # stores state of player holding key
-    def holdKey(self, holding):
-        self.holding = holding
-
-    # returns if player is dead
-    def isDead(self):
-        return self.dead
-
-    # resets player variables for new game
-    def resetPlayer(self):
-        self.dead = False
-        self.rect.x = 100
-        self.rect.y = 428
-        self.move_y = 0
-        self.move_x = 0
-                            
+from AssetLoader import Assets
+from Audio import Audio
+from Entities import kindColors
+from Ghost import Ghost, GhostBroadcaster, GhostRecorder, LiveGhost
+from LevelStreamer import LevelStreamer
+from Replay import Recorder, Replay
+from Profiler import FrameProfiler
+from Renderer import Renderer, ResolutionController, TextCache
+from ScoreStore import ScoreStore
+from Simulation import Simulation, Scenery, displayHeight, displayWidth, tickRate, jumpPress, jumpRelease
+
+maxLag = 0.25 # most seconds of game time owed at once, longer stalls slow the game down instead
+maxBlend = 64 # moves further than this in a tick are wraps or resets and are drawn without blending
+menuFps = 30 # frame rate of the main menu, its scenery still moves at game speed
+idleTimeout = 1000 # longest wait for input in milliseconds while paused or unfocused
+maxGhosts = 64 # most earlier runs raced at once
+ghostTint = (140,200,255,100) # multiplies player frames into translucent blue ghosts
+
+# draws the simulation with pygame and feeds it keyboard input
 class Main:
-    def __init__(self):
+    def __init__(self, dirty=False, timings=False, replay=None, fps=tickRate, music=True, window=None, resolution=1, dynamic=False,
+                 race=None, live=None, broadcast=None):
+        pygame.init() # initialize pygame
+
+        self.screen = pygame.display.set_mode(window or (displayWidth,displayHeight)) # screen, the game is scaled to fit
         pygame.display.set_caption('Runner') # game window title
-        
-        d = shelve.open('assets/score/scorefile') # open score file
-        try: # highscore has been recorded before
-            self.highsc = d['score'] # initialize session highscore to saved highscore
-        except (KeyError): # no score recorded yet
-            self.highsc = 0 # initialize session highscore to 0
-            d['score'] = 0 # create highscore save
-        d.close() # close score file
-        self.score = 0 # initialize score counter
-        
-        self.backdrop = [buildingsFar]*2 # list of two further building image to loop around
-        self.backdrop2 = [buildingsClose]*2 # list of two closer building image to loop around
-        self.lasers = [lasersImage]*2 # background lasers
-        self.laserTimer = time.time() # timer for flickering lasers
-        self.shipLaserTimer = time.time() # timer for switching ship's laser images
-        self.laserSet = False # has a laser image been assigned to moving ship
-        self.buildingsFar1Pos = 0 # initialize further buildings image x position 
-        self.buildingsFar2Pos = buildingsFar.get_width() # initialize second further buildings image x position 
-        self.buildingsClose1Pos = 0 # initialize closer buildings image x position 
-        self.buildingsClose2Pos = buildingsClose.get_width() # initialize second closer buildings image x position 
-        self.shipX = -200 # initialize moving ship's x position
-        self.shipY = 150 # initialize moving ship's y position
-        self.shipSpeed = 10 # initialize moveing ship's speed
-        self.shipLasers = [shipLaser1,shipLaser2,shipLaser3,shipLaser4] # list of moving ship's lasers in different directions
-
-        self.gap = False # keeps track of gaps between platforms
-        self.lastPlat = platBuffer-1 # points to current furthest platform
-        self.currentPlat = 0 # points to platform under player
-        self.platSet = False # remembers if currentPlat was incremented 
-
-        self.endTimer = 0 # after death timer
+        self.renderer = Renderer(self.screen, dirty, (displayWidth,displayHeight)) # draws frames, dirty mode only updates changed regions
+        self.renderer.setScale(resolution) # internal resolution as a share of the window
+        self.resolution = ResolutionController(1/fps, highest=resolution) if dynamic else None # lowers internal resolution when frames are slow
+        self.text = TextCache() # fonts and rendered strings
+        self.fps = fps # frames drawn per second, the game always ticks at tickRate
+        self.profiler = FrameProfiler(budget=1/fps) # times stages of recent frames, F3 shows graph, F4 exports
+        self.renderer.stageTimes = {} # renderer times drawing of each stage for the profiler
+        self.assets = Assets(timings) # loads images
+        self.audio = Audio(music) # decodes music in the background, each screen asks for its track
+        self.title = self.renderer.trim(self.assets.image('assets/images/title.png')) # main menu title
+
+        self.backgroundImage = self.assets.image('assets/images/sky.png') # background sky
+        self.buildingsFar = self.renderer.trim(self.assets.image('assets/images/buildingsFar.png')) # further buildings
+        self.buildingsClose = self.renderer.trim(self.assets.image('assets/images/buildingsClose.png')) # closer buildings
+        self.lasersImage = self.renderer.trim(self.assets.image('assets/images/lasers.png')) # background lasers
+        self.ship = self.assets.image('assets/images/ship.png') # moving ship
+        self.shipLasers = None # moving ship's lasers in different directions, loaded once the ship shows
+        self.playerImages = None # player animation, loaded once the game starts
+        self.ghostImages = None # tinted player animation shared by every ghost
+
+        self.clock = pygame.time.Clock() # used for framerate
+        self.lastTime = time.perf_counter() # when ticks owed were last counted
+        self.lag = 0 # seconds of game time not ticked yet
+
+        self.scores = ScoreStore() # run history, written in the background
+        self.highsc = self.scores.highscore() # initialize session highscore to saved highscore
+
+        self.scoreShown = None # score and highscore of rendered score text
+
+        self.scenery = Scenery(self.buildingsFar.get_width(), self.buildingsClose.get_width()) # moving background
+        self.replay = replay # recorded run being watched, keyboard jumps are ignored while set
+        self.sim = Simulation(replay.lookahead, levels=LevelStreamer()) if replay else Simulation(levels=LevelStreamer()) # game logic, platforms generated ahead off the frame
+        self.inputs = [] # jump inputs waiting for the next game tick
+        self.recorder = None # records inputs of current run
+        self.race = race # seed every run uses while racing earlier runs of it
+        self.ghosts = self.loadGhosts(race) if race is not None else [] # earlier runs drawn as translucent players
+        if live is not None: # (host, port) of a game broadcasting its runs
+            self.ghosts.append(LiveGhost(*live))
+        self.broadcaster = GhostBroadcaster(broadcast) if broadcast else None # sends runs to live ghosts in other games
+        self.ghostRecorder = None # records positions of current run
+        self.alpha = 1 # how far drawing is into the next tick
+        self.previous = self.positions() # positions before the last tick
+        self.shown = self.previous # positions being drawn
+
         self.isPaused = False # game is paused
         self.menuSet = False # menu has been displayed
         self.isMain = True # on main menu
         self.color1Set = False # color when option1 is clicked
         self.color2Set = False # color when option2 is clicked
-        self.musicLoaded = False # is music loaded with pygame
-        
-        player = Player() # instantiate player
-        playerGroup = pygame.sprite.Group(player) # sets varibale for player sprite group in order to call update
-        playerGroup.update(self.gap) # first update
-        self.platList = [] # initialize list for storing platforms
-        self.createPlats(platBuffer) # create and store platforms
-
-        # game loop    
+        self.focused = True # window has input focus
+        if replay: # go straight to the recorded run
+            self.isMain = False
+            self.startRun()
+        if timings:
+            print('startup assets took %.1f ms' % (self.assets.total()*1000))
+
+    # game loop
+    def run(self):
         while True:
-            for event in pygame.event.get(): # event handler
+            self.profiler.beginFrame()
+            self.profiler.mark('events')
+            events = pygame.event.get()
+            if not events and (self.isPaused or not self.focused): # nothing changes until input, sleeps until some arrives
+                self.profiler.mark('idle')
+                events = [pygame.event.wait(idleTimeout)] + pygame.event.get()
+                self.profiler.mark('events')
+            for event in events: # event handler
                 if event.type == pygame.KEYDOWN: # key down
                     if event.key == pygame.K_SPACE: # spacebar -> jump
-                        player.holdKey(True) # user is holding spacebar
-                        player.jump()
+                        self.inputs.append(jumpPress)
                     if event.key == pygame.K_ESCAPE: # escape key -> isPaused/unisPaused
-                        if not self.isPaused and not self.isMain: # ensures cannot pause twice or in main menu
-                            self.isPaused = True
-                            pygame.mixer.music.set_volume(0.1) # volume lowered when paused
-                        else:
-                            self.isPaused = False
-                            pygame.mixer.music.set_volume(1) # volume back to normal
-                            
+                        self.setPaused(not self.isPaused and not self.isMain) # ensures cannot pause twice or in main menu
+                    if event.key == pygame.K_F3: # F3 -> show/hide profiler graph
+                        self.profiler.toggle()
+                    if event.key == pygame.K_F4: # F4 -> export profiled frames
+                        self.exportProfile()
+
                 if event.type == pygame.KEYUP: # key up
                     if event.key == pygame.K_SPACE: # spacebar up
-                        player.holdKey(False) # user released spacebar
-                        
+                        self.inputs.append(jumpRelease)
+
                 if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1: # clicked mouse
-                    pos = pygame.mouse.get_pos() # xy position of mouse
-                    pygame.mouse.get_pressed()[0]
+                    pos = self.renderer.toLogical(pygame.mouse.get_pos()) # xy position of mouse in the game's coordinates
                     if self.isPaused: # game is paused
                         self.pausedMenu(True,False,pos) # call menu and pass button down mouse pos
-                    else:
-                        self.mainMenu(True,False,pos) # call menu
-                        
+                    elif self.isMain: # on main menu
+                        self.mainMenu(True,False,pos,0) # call menu
+
                 if event.type == pygame.MOUSEBUTTONUP and event.button == 1: # released mouse
-                    pos = pygame.mouse.get_pos() # xy position of mouse
+                    pos = self.renderer.toLogical(pygame.mouse.get_pos()) # xy position of mouse in the game's coordinates
                     if self.isPaused: # game is paused
                         self.pausedMenu(False,True,pos)
-                    else: 
-                        self.mainMenu(False,True,pos) # call menu and pass button up mouse pos
-                        
+                    elif self.isMain: # on main menu
+                        self.mainMenu(False,True,pos,0) # call menu and pass button up mouse pos
+
+                if event.type == pygame.WINDOWFOCUSLOST: # switched to another window
+                    self.focused = False
+                    if not self.isPaused and not self.isMain: # pauses run so it is not lost while away
+                        self.setPaused(True)
+                if event.type == pygame.WINDOWFOCUSGAINED:
+                    self.focused = True
+                if event.type == pygame.WINDOWEXPOSED: # window contents were lost, next frame sends everything
+                    self.renderer.invalidate()
+
                 if event.type == pygame.QUIT: # handles closing game
                     pygame.quit() # quit pygame
                     sys.exit() # exit system
-                    break # break from game loop
-            
-            # runs game if player is alive
-            if (not player.isDead() or (self.endTimer > 0 and time.time() - self.endTimer < 1)) and not self.isPaused and not self.isMain: # stops game after delay
-                self.game(playerGroup)
-            elif player.isDead() and self.endTimer == 0: # start delay timer if player dies
-                self.endTimer = time.time()
-            elif not self.isPaused and not self.isMain: # reset the game
-                self.setHighscore() # checks/sets highscore
-                self.resetGame()
-                player.resetPlayer()
+
+            busyStart = time.perf_counter() # frame work starts after waiting for input
+            ticks, alpha = self.schedule(not self.isPaused and self.focused) # menu stops moving while unfocused
+
+            # runs game until player has been dead for a second
+            if not self.isPaused and not self.isMain:
+                if self.sim.isOver() and self.replay: # replay finished, back to main menu
+                    self.replay = None
+                    self.isMain = True
+                elif self.sim.isOver(): # reset the game
+                    self.recordRun() # stores run and highscore
+                    self.startRun()
+                else:
+                    self.game(ticks, alpha)
 
             # control main menu
             if self.isMain:
-                self.mainMenu(False,False,None)
+                del self.inputs[:] # jumps pressed on the menu are ignored
+                self.mainMenu(False,False,None,ticks,alpha)
 
             # control paused menu
             if self.isPaused and not self.menuSet: # only draws menu options once
@@ -230,16 +161,64 @@ class Main:
             elif not self.isPaused and self.menuSet:
                 self.menuSet = False
 
-            clock.tick(120) # update speed
-            pygame.display.update() # updates display
+            if self.profiler.visible: # graph of recent frames in top right corner
+                self.profiler.mark('profiler')
+                self.renderer.setOverlay(self.profiler.overlay(), (displayWidth-370,10))
+            else:
+                self.renderer.setOverlay(None)
+
+            self.audio.update() # crossfades music
+            busy = time.perf_counter() - busyStart
+            self.profiler.mark('wait')
+            self.clock.tick(min(self.fps, menuFps) if self.isMain else self.fps) # frame rate, game speed comes from schedule
+            self.profiler.mark('present')
+            presentStart = time.perf_counter()
+            self.renderer.present() # updates display
+            if self.resolution is not None:
+                scale = self.resolution.update(busy + time.perf_counter() - presentStart)
+                if scale is not None:
+                    self.renderer.setScale(scale)
+            self.profiler.nest(self.renderer.takeStageTimes())
+            self.profiler.endFrame()
+
+    # pauses or resumes the run, music is quieter while paused
+    def setPaused(self, paused):
+        self.isPaused = paused
+        self.audio.duck(paused)
+
+    # fixed ticks owed since the last frame and how far the next tick has come, from 0 to 1
+    # time spent paused is not owed
+    def schedule(self, running):
+        now = time.perf_counter()
+        if running:
+            self.lag += min(now - self.lastTime, maxLag)
+        self.lastTime = now
+        ticks = int(self.lag * tickRate)
+        self.lag -= ticks / tickRate
+        return ticks, self.lag * tickRate
+
+    # positions of everything that moves, drawing blends the ones before and after the last tick
+    def positions(self):
+        s = self.scenery
+        player = self.sim.player.rect
+        return (self.sim.platforms.scroll, player.x, player.y, s.buildingsFar1Pos, s.buildingsFar2Pos,
+                s.buildingsClose1Pos, s.buildingsClose2Pos, s.shipX)
+
+    # positions alpha of the way from before the last tick to now
+    def blend(self, alpha):
+        return tuple(round(old + (new-old)*alpha) if abs(new-old) <= maxBlend else new for old, new in zip(self.previous, self.positions()))
+
+    # writes profiled frames as chrome trace json and csv
+    def exportProfile(self):
+        name = 'profile-%d' % time.time()
+        self.profiler.exportTrace(name+'.json')
+        self.profiler.exportCsv(name+'.csv')
+        print('profile saved to', name+'.json', 'and', name+'.csv')
 
     # main menu screen
-    def mainMenu(self,down,up,pos):
-        if not self.musicLoaded: # checks weather or not music has been loaded
-            pygame.mixer.music.load('assets/music/menu.ogg') # load menu music
-            pygame.mixer.music.play(-1) # play and loop music
-            self.musicLoaded = True # remember music is loaded
-        
+    def mainMenu(self,down,up,pos,ticks=1,alpha=1.0):
+        self.audio.play('menu') # crossfades to menu music when coming from a run
+
         color1 = (200,200,200) # default white
         color2 = (200,200,200) # default white
         if down: # mouse button down
@@ -255,9 +234,8 @@ class Main:
             x = pos[0] # mouse x position
             y = pos[1] # mouse y position
             if x > 580 and x <700 and y > 300 and y < 355: # mouse is over resume button
-                self.musicLoaded = False # allows game to set music
                 self.isMain = False
-                self.resetGame()
+                self.startRun()
             if x > 590 and x <670 and y > 400 and y < 435: # mouse is over quit button
                 pygame.quit() # quit game
                 sys.exit() # exit system
@@ -267,52 +245,128 @@ class Main:
         if self.color2Set:
             color2 = (200,200,0) # yellow if clicked
 
-        self.setScenery() # sets position of scenery
+        self.profiler.mark('scenery.update')
+        for i in range(ticks):
+            self.previous = self.positions()
+            self.scenery.update() # sets position of scenery
+        self.profiler.mark('queue')
+        self.shown = self.blend(alpha)
+        self.renderer.beginScene()
         self.drawScenery() # moving scenery
 
-        font1 = pygame.font.Font(None, 80) # set large font
-        font2 = pygame.font.Font(None, 50) # set small font
-        font3 = pygame.font.Font(None, 24) # set small font
-        
-        screen.blit(title, (0,0)) # display title on screen
-
-        play = font1.render("Play", 1, color1)
-        screen.blit(play, (displayWidth/2-58,300)) # display play on screen
-
-        quitgame = font2.render("Quit", 1, color2)
-        screen.blit(quitgame, (displayWidth/2-40,400)) # display quit on screen
-
-        info = font3.render("Developed by Eric Svitok", 1, (200,200,200))
-        screen.blit(info, (displayWidth/2-98,displayHeight-20)) # made by me
-
-    # game screen
-    def game(self, playerGroup):
-        if not self.musicLoaded: # checks weather or not music has been loaded
-            pygame.mixer.music.load('assets/music/game.ogg') # load game music
-            pygame.mixer.music.play(-1) # play and loop music
-            self.musicLoaded = True # remember music is loaded
-
-        self.setScenery() # sets position of scenery
+        self.renderer.stage = 'menu'
+        self.renderer.blit(self.title, (0,0)) # display title on screen
+
+        play = self.text.render("Play", 80, color1) # large font
+        self.renderer.blit(play, (displayWidth/2-58,300)) # display play on screen
+
+        quitgame = self.text.render("Quit", 50, color2) # small font
+        self.renderer.blit(quitgame, (displayWidth/2-40,400)) # display quit on screen
+
+        info = self.text.render("Developed by Eric Svitok", 24, (200,200,200)) # small font
+        self.renderer.blit(info, (displayWidth/2-98,displayHeight-20)) # made by me
+
+    # game screen, steps the game ticks times and draws alpha of the way into the next tick
+    def game(self, ticks=1, alpha=1.0):
+        self.audio.play('game') # crossfades to game music when coming from the menu
+
+        for i in range(ticks):
+            if self.sim.isOver(): # run loop records the run before any more ticks
+                break
+            self.previous = self.positions()
+            self.profiler.mark('scenery.update')
+            self.scenery.update() # sets position of scenery
+            self.profiler.mark('sim.step')
+            if self.replay: # inputs come from the recording
+                self.inputs[:] = self.replay.inputs(self.sim.runTicks())
+            self.recorder.record(self.sim.runTicks(), self.inputs)
+            self.sim.step(self.inputs) # advances game logic one tick
+            del self.inputs[:] # inputs have been consumed
+            player = self.sim.player
+            self.ghostRecorder.add(player.rect.x, player.rect.y, player.pIndex)
+        for ghost in self.ghosts:
+            ghost.seek(self.sim.runTicks()-1) # first recorded position is after the first tick
+
+        self.profiler.mark('queue')
+        self.alpha = alpha
+        self.shown = self.blend(alpha)
+        self.renderer.beginScene()
         self.drawScenery() # moving scenery
-        
-        for i in range(platBuffer): # iterates through platforms
-            if self.platEnd(i) < 0: # platform at index passes left of screen
-                self.resetPlat(i) # reset platform at index
-            self.platList[i].draw() # draws platform at index
-            self.platList[i].update() # updates platform at index
-            
-        self.setPlatIndex() 
-        self.setGap() 
-        self.displayScore(self.score)
-        playerGroup.update(self.gap)
-        playerGroup.draw(screen)
+        self.drawPlatforms()
+        self.drawEntities()
+        self.displayScore(self.sim.score)
+        self.drawGhosts()
+        self.drawPlayer()
+
+    # draws platforms on screen
+    def drawPlatforms(self):
+        self.renderer.stage = 'platforms'
+        for rect in self.sim.platforms.rects(self.shown[0]): # iterates through platforms on screen
+            self.renderer.fill((0,0,0), rect) # draws black rectangle
+
+    # draws pickups and obstacles on screen, found through the entity grid
+    def drawEntities(self):
+        if not self.sim.entities:
+            return
+        self.renderer.stage = 'entities'
+        scroll = self.shown[0]
+        for entity in self.sim.entities.collide(pygame.Rect(scroll, 0, displayWidth, displayHeight)):
+            self.renderer.fill(kindColors.get(entity.kind, (255,255,255)), entity.rect.move(-scroll, 0))
+
+    # player animation images, loaded on first use
+    def loadPlayerImages(self):
+        if self.playerImages is None:
+            self.playerImages = [image for image, offset in self.assets.sheet('player')]
+        return self.playerImages
+
+    # earlier runs of a seed that have ghost files, best first
+    def loadGhosts(self, seed):
+        ghosts = []
+        for run in self.scores.top(len(self.scores.runs)):
+            path = self.scores.ghostPath(run)
+            if run['seed'] != seed or path is None:
+                continue
+            try:
+                ghosts.append(Ghost.open(path))
+            except (OSError, ValueError): # not written or damaged
+                continue
+            if len(ghosts) >= maxGhosts:
+                break
+        return ghosts
+
+    # draws ghosts as translucent players, the renderer blits them together
+    def drawGhosts(self):
+        if not self.ghosts:
+            return
+        self.renderer.stage = 'ghosts'
+        if self.ghostImages is None: # tinted once, every ghost shares them
+            self.ghostImages = []
+            for image in self.loadPlayerImages():
+                image = image.copy()
+                image.fill(ghostTint, special_flags=pygame.BLEND_RGBA_MULT)
+                self.ghostImages.append(image)
+        for ghost in self.ghosts:
+            if ghost.now is None: # run ended or live ghost not connected
+                continue
+            x, y, index = ghost.now
+            if ghost.before is not None and abs(x-ghost.before[0]) <= maxBlend and abs(y-ghost.before[1]) <= maxBlend:
+                x = round(ghost.before[0] + (x-ghost.before[0])*self.alpha)
+                y = round(ghost.before[1] + (y-ghost.before[1])*self.alpha)
+            self.renderer.blit(self.ghostImages[index], (x, y))
+
+    # draws player's current animation image
+    def drawPlayer(self):
+        self.renderer.stage = 'player'
+        self.loadPlayerImages()
+        self.sim.player.image = self.playerImages[self.sim.player.pIndex] # sets current sprite image
+        self.renderer.blit(self.sim.player.image, self.sim.player.rect.move(self.shown[1]-self.sim.player.rect.x, self.shown[2]-self.sim.player.rect.y))
 
     # pause screen
     def pausedMenu(self, down, up, pos):
         color1 = (200,200,200) #white by default
         color2 = (200,200,200) #white by default
         color3 = (200,200,200) #white by default
-        
+
         if down: # mouse button down
             x = pos[0] # mouse x position
             y = pos[1] # mouse y position
@@ -326,143 +380,90 @@ class Main:
             x = pos[0] # mouse x position
             y = pos[1] # mouse y position
             if x > 565 and x <710 and y > 230 and y < 260: # mouse is over resume button
-                self.isPaused = False
-                pygame.mixer.music.set_volume(1) # volume back to normal
+                self.setPaused(False)
             if x > 550 and x <735 and y > 330 and y < 360: # mouse is over menu button
-                self.musicLoaded = False # allows menu to set music
                 self.isMain = True # on main menu
-                self.isPaused = False # no longer paused
-                pygame.mixer.music.set_volume(1) # volume back to normal
+                self.setPaused(False) # no longer paused
             if x > 590 and x <670 and y > 430 and y < 460: # mouse is over quit button
                 pygame.quit() # quit game
-                sys.exit() # exit system           
-        
-        font = pygame.font.Font(None, 50) # set font
+                sys.exit() # exit system
 
-        resume = font.render("Resume", 1, color1)
-        screen.blit(resume, (displayWidth/2-70,230)) # display resume on screen
+        self.renderer.stage = 'menu'
+        resume = self.text.render("Resume", 50, color1)
+        self.renderer.blit(resume, (displayWidth/2-70,230)) # display resume on screen
 
-        main = font.render("Main Menu", 1, color2)
-        screen.blit(main, (displayWidth/2-90,330)) # display main menu on screen
+        main = self.text.render("Main Menu", 50, color2)
+        self.renderer.blit(main, (displayWidth/2-90,330)) # display main menu on screen
 
-        quitgame = font.render("Quit", 1, color3)
-        screen.blit(quitgame, (displayWidth/2-45,430)) # display quit on screen
+        quitgame = self.text.render("Quit", 50, color3)
+        self.renderer.blit(quitgame, (displayWidth/2-45,430)) # display quit on screen
 
     # moving background images
     def drawScenery(self):
-        screen.blit(backgroundImage,[0,0]) # updates background every frame
-        
-        if time.time() - self.laserTimer > 0.1:
-            screen.blit(self.lasers[0],[self.buildingsFar1Pos,0]) # updates background lasers
-            screen.blit(self.lasers[1],[self.buildingsFar2Pos,0]) # updates background lasers
-            if time.time() - self.laserTimer > random.uniform(0,1): # flashes lasers at random rate
-                self.laserTimer = time.time()
-        
-        screen.blit(self.backdrop[0],[self.buildingsFar1Pos,0]) # draws further background buildings
-        screen.blit(self.backdrop[1],[self.buildingsFar2Pos,0]) # draws further background buildings
-
-        if not self.laserSet: # if new laser has not been set
-            self.laserChoice = random.choice(self.shipLasers) # chooses random laser direction
-            self.laserSet = True # has been set
-        if self.shipX >= -100: # if ship position is about to be on screen
-            screen.blit(self.laserChoice,[self.shipX-730,self.shipY-730]) # draw ship's lasers
-            screen.blit(ship,[self.shipX,self.shipY]) # draw ship
-        if time.time() - self.shipLaserTimer > random.uniform(0,2): # flashes ship's lasers at random rate
-            self.shipLaserTimer = time.time() # reset timer
-            self.laserSet = False # has not been set
-
-        screen.blit(self.backdrop2[0],[self.buildingsClose1Pos,0]) # draws closer background buildings
-        screen.blit(self.backdrop2[1],[self.buildingsClose2Pos,0]) # draws closer background buildings
-        
-    # instantiates and appends platforms to list
-    def createPlats(self, buffer):
-        for i in range(buffer):
-            newPlat = Platform(self.platEnd(i-1), displayHeight/1.4, 400, displayHeight/2.5) # instantiates platforms back to back
-            self.platList.append(newPlat) # append platform instance to list
-
-    # moves passed platforms to the end and changes size/spacing
-    def resetPlat(self, index):
-        self.platList[index].rect.width = random.randint(200,800) # sets random platform width
-        self.platList[index].rect.x = self.platEnd(self.lastPlat) + random.randint(100,550) # places at end at random distance from the platform ahead
-        self.lastPlat = index # sets lastPlat pointer to index of moved platform
-
-    # determines if player is over a gap
-    def setGap(self):
-        if self.platStart(self.currentPlat) < 100 and self.platEnd(self.currentPlat) > 100 and self.gap:
-            self.gap = False # player is on a platform
-        elif self.platEnd(self.currentPlat) < 100 and not self.gap: # if player completely passes platform
-            if self.platStart((self.currentPlat+1)%platBuffer) > 100: # ensures there is no immediate platform
-                self.gap = True # player is in between platforms
-                self.score += 1 # increment score
-            self.platSet = False # new plat needs to be set
-            
-    # gets position of beginning of a platform at specified index               
-    def platEnd(self, index):
-        if len(self.platList) > 0: # makes sure list contains an object
-            return self.platList[index].rect.x + self.platList[index].rect.width
-        else: # returns 0 if list is empty
-            return 0 
-
-    # gets position of beginning of a platform at specified index
-    def platStart(self, index):
-        if len(self.platList) > 0: # makes sure list contains an object
-            return self.platList[index].rect.x
-        else: # returns 0 if list is empty
-            return 0
-
-    # sets index of next platform under player
-    def setPlatIndex(self):
-        if self.platEnd(self.currentPlat) < 100 and not self.platSet:
-            self.currentPlat = (self.currentPlat+1)%platBuffer # increments platform index (circular)
-            self.platSet = True # ensures currentPlat increments only once per call
-
-    # stores and and moves positioning of background scenery
-    def setScenery(self):
-        if self.buildingsFar1Pos <= -buildingsFar.get_width(): # loops furthest buildings
-            self.buildingsFar1Pos = buildingsFar.get_width()
-        if self.buildingsFar2Pos <= -buildingsFar.get_width(): # loops furthest buildings
-            self.buildingsFar2Pos = buildingsFar.get_width()
-        if self.buildingsClose1Pos <= -buildingsClose.get_width(): # loops closer buildings
-            self.buildingsClose1Pos = buildingsClose.get_width()
-        if self.buildingsClose2Pos <= -buildingsClose.get_width(): # loops closer buildings
-            self.buildingsClose2Pos = buildingsClose.get_width()
-        if self.shipX >= displayWidth: # loops moving ship 
-            self.shipSpeed = random.randint(2,10) # random ship speed
-            self.shipY = random.randint(150,600) # random ship height
-            self.shipX = random.randint(-3000,-100) # random reset point
-        self.buildingsFar1Pos -= 1 # move furthest buildings
-        self.buildingsFar2Pos -= 1 # move furthest buildings
-        self.buildingsClose1Pos -= 4 # move closer buildings
-        self.buildingsClose2Pos -= 4 # move closer buildings
-        self.shipX += self.shipSpeed # move ship
-
-    # shows score (number of platforms passed)
+        s = self.scenery
+        scroll, playerX, playerY, far1, far2, close1, close2, shipX = self.shown
+        self.renderer.stage = 'scenery'
+        self.renderer.blit(self.backgroundImage,[0,0]) # updates background every frame
+
+        if s.lasersVisible:
+            self.renderer.blit(self.lasersImage,[far1,0]) # updates background lasers
+            self.renderer.blit(self.lasersImage,[far2,0]) # updates background lasers
+
+        self.renderer.blit(self.buildingsFar,[far1,0]) # draws further background buildings
+        self.renderer.blit(self.buildingsFar,[far2,0]) # draws further background buildings
+
+        if shipX >= -100: # if ship position is about to be on screen
+            if self.shipLasers is None:
+                self.shipLasers = self.assets.sheet('shipLasers') # lasers are trimmed, offset places them as before
+            laser, offset = self.shipLasers[s.laserIndex]
+            self.renderer.blit(laser,[shipX-730+offset[0],s.shipY-730+offset[1]]) # draw ship's lasers
+            self.renderer.blit(self.ship,[shipX,s.shipY]) # draw ship
+
+        self.renderer.blit(self.buildingsClose,[close1,0]) # draws closer background buildings
+        self.renderer.blit(self.buildingsClose,[close2,0]) # draws closer background buildings
+
+    # shows score (number of platforms passed), only renders text again when a score changes
     def displayScore(self, score):
-        font = pygame.font.Font(None, 28)
-        sc = font.render("Score: " + str(score), 1, (125,125,0))
-        if score > self.highsc: # current score passes highscore
-            highsc = font.render("Highest: " + str(score), 1, (125,125,0)) # display highscore as current score
-        else: # current score is below highscore
-            highsc = font.render("Highest: " + str(self.highsc), 1, (125,125,0))# display highscore
-        screen.blit(sc, (27,5)) # display score on screen
-        screen.blit(highsc, (10,23)) # display highscore on screen
-
-    # stores highscore
-    def setHighscore(self):
-        d = shelve.open('assets/score/scorefile') # opens .dat file
-        if self.score > d['score']: # if current score is highest ever
-            d['score'] = self.score # record new highscore
-            self.highsc = d['score'] # updates session highscore with saved highscore
-        d.close() # close .dat file
-
-    # resets variables to play from start
-    def resetGame(self):
-        self.score = 0 
-        self.endTimer = 0
-        self.gap = False
-        self.lastPlat = platBuffer-1
-        self.currentPlat = 0
-        del self.platList[:] # removes old platforms
-        self.createPlats(platBuffer) # creates new platforms
-        #print("Game Reset")
-Main()
+        self.renderer.stage = 'score'
+        highest = max(score, self.highsc) # display highscore as current score once passed
+        if self.scoreShown != (score, highest):
+            self.scoreShown = (score, highest)
+            self.scoreText = self.text.render("Score: " + str(score), 28, (125,125,0))
+            self.highscText = self.text.render("Highest: " + str(highest), 28, (125,125,0))
+        self.renderer.blit(self.scoreText, (27,5)) # display score on screen
+        self.renderer.blit(self.highscText, (10,23)) # display highscore on screen
+
+    # starts a new run, with the recorded seed when watching a replay and the raced seed when racing
+    def startRun(self, seed=None):
+        if self.replay:
+            seed = self.replay.seed
+        elif seed is None:
+            seed = self.race # None picks a random level
+        self.sim.reset(seed)
+        self.scenery.reseed(self.sim.seed)
+        self.recorder = Recorder(self.sim.seed, self.sim.lookahead)
+        self.ghostRecorder = GhostRecorder(self.sim.seed, self.broadcaster.send if self.broadcaster else None)
+        for ghost in self.ghosts:
+            ghost.rewind()
+        self.previous = self.positions() # nothing to blend from
+        del self.inputs[:] # jumps pressed before the run are ignored
+
+    # queues finished run, its replay and ghost for saving and updates highscore
+    def recordRun(self):
+        replay = self.recorder.finish(self.sim.runTicks(), self.sim.score)
+        ghost = self.ghostRecorder.finish()
+        self.scores.record(self.sim.score, self.sim.duration(), self.sim.seed, replay, ghost)
+        if self.race is not None and len(self.ghosts) < maxGhosts: # races this run from the next one on
+            self.ghosts.append(Ghost(io.BytesIO(ghost)))
+        self.highsc = max(self.highsc, self.sim.score) # updates session highscore
+
+if __name__ == '__main__':
+    replay = Replay.open(sys.argv[sys.argv.index('--replay')+1]) if '--replay' in sys.argv else None # watch a recorded run
+    fps = int(sys.argv[sys.argv.index('--fps')+1]) if '--fps' in sys.argv else tickRate # frames drawn per second
+    window = tuple(map(int, sys.argv[sys.argv.index('--window')+1].split('x'))) if '--window' in sys.argv else None # window size, like 1920x1080
+    resolution = float(sys.argv[sys.argv.index('--resolution')+1]) if '--resolution' in sys.argv else 1 # internal resolution as a share of the window
+    race = int(sys.argv[sys.argv.index('--race')+1]) if '--race' in sys.argv else None # seed to race earlier runs on
+    live = sys.argv[sys.argv.index('--live')+1].rsplit(':', 1) if '--live' in sys.argv else None # host:port of a broadcasting game
+    broadcast = int(sys.argv[sys.argv.index('--broadcast')+1]) if '--broadcast' in sys.argv else None # port to send runs on
+    Main(dirty='--dirty' in sys.argv, timings='--timings' in sys.argv, replay=replay, fps=fps, window=window, resolution=resolution,
+         dynamic='--fixed' not in sys.argv, race=race, live=(live[0], int(live[1])) if live else None, broadcast=broadcast).run() # --dirty only redraws changed regions, --timings reports asset loading, --fixed keeps resolution
@@ -0,0 +1,215 @@
+import time
+import socket
+import struct
+import threading
+from array import array
+from Simulation import playerFrames
+
+# ghost stream: records, each starting with a tag byte
+# a run record starts a run, chunk records hold the player's screen position and animation index on following ticks
+# a chunk stores its first tick in full and the rest as signed byte deltas, so files can be read a chunk at a time
+# files hold one run, live streams start a new run record whenever the sender starts a run
+magic = b'GST1'
+runRecord = b'H'
+chunkRecord = b'C'
+runHeader = struct.Struct('<4sQ') # magic, seed
+chunkHeader = struct.Struct('<HhhB') # ticks, x, y, animation index of first tick
+chunkTicks = 256 # ticks per chunk in files
+
+# encodes positions as chunk records, starting another chunk wherever a move is too big for a delta
+def encodeChunks(positions):
+    records = []
+    start = 0
+    while start < len(positions):
+        x, y, index = positions[start]
+        deltas = array('b')
+        end = start + 1
+        while end < len(positions) and end - start < 0xffff:
+            nx, ny, nindex = positions[end]
+            if not (-128 <= nx-x <= 127 and -128 <= ny-y <= 127):
+                break
+            deltas.extend((nx-x, ny-y, (nindex-index) % playerFrames))
+            x, y, index = nx, ny, nindex
+            end += 1
+        records.append(chunkRecord + chunkHeader.pack(end-start, *positions[start]) + deltas.tobytes())
+        start = end
+    return records
+
+# reads the next record of a binary stream, a file or socket, returns ('run', seed), ('chunk', positions) or None at the end
+def readRecord(stream):
+    tag = stream.read(1)
+    if tag == runRecord:
+        data = stream.read(runHeader.size)
+        if len(data) < runHeader.size: # cut off
+            return None
+        tag, seed = runHeader.unpack(data)
+        if tag != magic:
+            raise ValueError('not a ghost stream')
+        return ('run', seed)
+    if tag == chunkRecord:
+        data = stream.read(chunkHeader.size)
+        if len(data) < chunkHeader.size:
+            return None
+        count, x, y, index = chunkHeader.unpack(data)
+        deltas = array('b')
+        data = stream.read((count-1)*3)
+        if len(data) < (count-1)*3:
+            return None
+        deltas.frombytes(data)
+        positions = [(x, y, index)]
+        for i in range(0, len(deltas), 3):
+            x += deltas[i]
+            y += deltas[i+1]
+            index = (index + deltas[i+2]) % playerFrames
+            positions.append((x, y, index))
+        return ('chunk', positions)
+    if tag:
+        raise ValueError('not a ghost stream')
+    return None
+
+# records the player's position every tick of a run
+# positions are kept in memory as encoded chunks, listener gets small records every tick for live streaming
+class GhostRecorder:
+    def __init__(self, seed, listener=None):
+        self.data = bytearray(runRecord + runHeader.pack(magic, seed)) # encoded run
+        self.pending = [] # positions not in a chunk yet
+        self.listener = listener # called with each live record
+        if listener is not None:
+            listener(bytes(self.data))
+
+    # adds player position of the next tick
+    def add(self, x, y, index):
+        self.pending.append((x, y, index))
+        if self.listener is not None:
+            for record in encodeChunks([(x, y, index)]):
+                self.listener(record)
+        if len(self.pending) >= chunkTicks:
+            self.flush()
+
+    # encodes pending positions
+    def flush(self):
+        for record in encodeChunks(self.pending):
+            self.data += record
+        self.pending = []
+
+    # encoded run, ready to be saved
+    def finish(self):
+        self.flush()
+        return bytes(self.data)
+
+# a recorded run played back from a stream, only the chunk being played is in memory
+class Ghost:
+    def __init__(self, stream):
+        self.stream = stream # open binary file
+        record = readRecord(stream)
+        if record is None or record[0] != 'run':
+            raise ValueError('ghost stream does not start with a run')
+        self.seed = record[1] # level seed of the run
+        self.start = stream.tell() # where the first chunk begins
+        self.rewind()
+
+    # opens a ghost file
+    @classmethod
+    def open(cls, path):
+        return cls(open(path, 'rb'))
+
+    # goes back to the start of the run
+    def rewind(self):
+        self.stream.seek(self.start)
+        self.chunk = [] # positions of the chunk being played
+        self.next = 0 # index in chunk of the next tick
+        self.tick = -1 # tick of now
+        self.before = None # position on the tick before now
+        self.now = None # position on current tick, None once the run ended
+        self.ended = False # no more chunks
+
+    # moves forward to a tick, reading chunks as they are needed
+    def seek(self, tick):
+        while self.tick < tick and not self.ended:
+            if self.next >= len(self.chunk):
+                record = readRecord(self.stream)
+                if record is None or record[0] != 'chunk':
+                    self.ended = True
+                    self.before = self.now = None
+                    break
+                self.chunk = record[1]
+                self.next = 0
+            self.before = self.now
+            self.now = self.chunk[self.next]
+            self.next += 1
+            self.tick += 1
+
+    # closes the stream
+    def close(self):
+        self.stream.close()
+
+# ghost fed by another game over a local socket, shows the newest position received
+class LiveGhost:
+    def __init__(self, host, port):
+        self.address = (host, port) # broadcasting game
+        self.latest = None # newest position received
+        self.before = None # position drawn on the frame before
+        self.now = None # position being drawn
+        self.reader = threading.Thread(target=self.read, daemon=True) # receives records off the frame
+        self.reader.start()
+
+    # receiver thread, connects and follows the stream, reconnects when the sender goes away
+    def read(self):
+        while True:
+            try:
+                with socket.create_connection(self.address) as connection:
+                    stream = connection.makefile('rb')
+                    while True:
+                        record = readRecord(stream)
+                        if record is None:
+                            break
+                        if record[0] == 'chunk':
+                            self.latest = record[1][-1]
+            except (OSError, ValueError):
+                pass
+            self.latest = None
+            time.sleep(1) # sender not there, tries again later
+
+    # live ghosts have no start to go back to
+    def rewind(self):
+        pass
+
+    # takes the newest position, tick is ignored since the sender keeps its own time
+    def seek(self, tick):
+        self.before = self.now
+        self.now = self.latest
+
+# sends the game's runs to live ghosts connected on a local port
+class GhostBroadcaster:
+    def __init__(self, port, host='127.0.0.1'):
+        self.server = socket.create_server((host, port)) # accepts ghosts
+        self.clients = [] # connected sockets
+        self.header = None # run record of current run, new clients get it first
+        self.lock = threading.Lock()
+        self.acceptor = threading.Thread(target=self.accept, daemon=True)
+        self.acceptor.start()
+
+    # acceptor thread, adds connecting ghosts
+    def accept(self):
+        while True:
+            client, address = self.server.accept()
+            client.settimeout(0.01) # a stalled receiver is dropped instead of holding up the frame
+            with self.lock:
+                try:
+                    if self.header is not None:
+                        client.sendall(self.header)
+                    self.clients.append(client)
+                except OSError:
+                    client.close()
+
+    # sends a record to every connected ghost
+    def send(self, record):
+        with self.lock:
+            if record[:1] == runRecord:
+                self.header = record
+            for client in list(self.clients):
+                try:
+                    client.sendall(record)
+                except OSError:
+                    self.clients.remove(client)
+                    client.close()
@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import random
+import hashlib
+import inspect
+import argparse
+from multiprocessing import Pool
+from Simulation import Player, nextPlat, platBuffer, platGaps, platWidths, runSpeed, tickRate
+
+envelopePath = 'assets/cache/envelope.json' # cached jump envelope
+playerX = 100 # screen x where player touches platforms
+
+# fingerprint of the physics the envelope was computed from, changes whenever Player or the speeds change
+def physicsSignature():
+    source = inspect.getsource(Player) + repr((runSpeed, tickRate))
+    return hashlib.sha1(source.encode()).hexdigest()
+
+# ticks from pressing jump until the landing check, holding jump for hold ticks
+def airtime(hold):
+    player = Player()
+    player.holdKey(True)
+    player.jump()
+    if hold == 0: # released on the same tick
+        player.holdKey(False)
+    ticks = 0
+    while True:
+        ticks += 1
+        if ticks-1 == hold and hold > 0:
+            player.holdKey(False)
+        player.update(True) # always over a gap, so the landing check marks the player dead
+        if player.isDead():
+            return ticks
+
+# every airtime a jump can have, mapped to a hold that gives it
+def computeEnvelope():
+    airtimes = {}
+    longest = airtime(10**9) # held until landing
+    for hold in range(longest+1): # holding longer than the jump changes nothing
+        airtimes.setdefault(airtime(hold), hold)
+    return airtimes
+
+# loads envelope from cache, computing and caching it when physics changed
+def loadEnvelope():
+    signature = physicsSignature()
+    try:
+        with open(envelopePath) as f:
+            cached = json.load(f)
+        if cached['signature'] == signature:
+            return {int(ticks): hold for ticks, hold in cached['airtimes'].items()}
+    except (OSError, ValueError, KeyError): # no usable cache
+        pass
+    airtimes = computeEnvelope()
+    os.makedirs(os.path.dirname(envelopePath), exist_ok=True)
+    with open(envelopePath, 'w') as f:
+        json.dump({'signature': signature, 'airtimes': airtimes}, f)
+    return airtimes
+
+# platforms of a seeded run as (start, end) world positions, generated the way Simulation does
+def level(seed, count, widths=platWidths, gaps=platGaps):
+    rng = random.Random(seed)
+    plats = [(400*i, 400*(i+1)) for i in range(platBuffer)] # flat opening
+    end = plats[-1][1]
+    for i in range(count):
+        gap, width = nextPlat(rng, widths, gaps)
+        plats.append((end+gap, end+gap+width))
+        end += gap + width
+    return plats
+
+# finds the first platform that can never be left, None if every platform can be reached
+# the player is at world x playerX + runSpeed*k on tick k, a platform holds the player on ticks lo to hi
+# a jump pressed on tick p needs ground on tick p-1 and lands on tick p+airtime-1
+def firstDeadEnd(plats, shortest, longest):
+    ticks = [((start-playerX)//runSpeed + 1, (end-playerX)//runSpeed) for start, end in plats]
+    earliest = [None]*len(plats) # first tick each platform can be stood on
+    earliest[0] = 0
+    for i, (lo, hi) in enumerate(ticks):
+        if earliest[i] is None:
+            continue
+        if i+1 < len(plats) and ticks[i+1][0] == hi+1: # touching platforms, walks onto next
+            earliest[i+1] = ticks[i+1][0] if earliest[i+1] is None else min(earliest[i+1], ticks[i+1][0])
+        first = earliest[i] + shortest # earliest landing tick
+        last = hi + longest # latest landing tick
+        j = i+1
+        while j < len(plats) and ticks[j][0] <= last:
+            if ticks[j][1] >= first:
+                landing = max(ticks[j][0], first)
+                earliest[j] = landing if earliest[j] is None else min(earliest[j], landing)
+            j += 1
+    reached = max(i for i in range(len(plats)) if earliest[i] is not None)
+    return None if reached == len(plats)-1 else reached
+
+# checks a range of seeds, returns amount checked and (seed, platform, gap, width before, width after) of impossible gaps
+def fuzzRange(args):
+    first, count, platforms, widths, gaps, shortest, longest = args
+    found = []
+    for seed in range(first, first+count):
+        plats = level(seed, platforms, widths, gaps)
+        stuck = firstDeadEnd(plats, shortest, longest)
+        if stuck is not None:
+            start, end = plats[stuck]
+            found.append((seed, stuck-platBuffer, plats[stuck+1][0]-end, end-start, plats[stuck+1][1]-plats[stuck+1][0]))
+    return count, found
+
+# checks seeds first to first+sequences across a process pool
+def fuzz(sequences, platforms=50, widths=platWidths, gaps=platGaps, first=0, workers=None, chunk=2000):
+    airtimes = loadEnvelope()
+    shortest, longest = min(airtimes), max(airtimes)
+    if sorted(airtimes) != list(range(shortest, longest+1)): # firstDeadEnd treats airtimes as one range
+        raise ValueError('jump envelope has holes, airtimes %s' % sorted(airtimes))
+    jobs = [(seed, min(chunk, first+sequences-seed), platforms, widths, gaps, shortest, longest) for seed in range(first, first+sequences, chunk)]
+    checked = 0
+    found = []
+    with Pool(workers) as pool:
+        for count, impossible in pool.imap_unordered(fuzzRange, jobs):
+            checked += count
+            found += impossible
+    found.sort()
+    return checked, found, airtimes
+
+# python LevelFuzzer.py --sequences 1000000 --gaps 100 550, reports seeds with gaps no jump can clear
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates seeded levels and reports gaps no jump can clear')
+    parser.add_argument('--sequences', type=int, default=100000, help='amount of seeds checked')
+    parser.add_argument('--first', type=int, default=0, help='first seed checked')
+    parser.add_argument('--platforms', type=int, default=50, help='random platforms generated per seed')
+    parser.add_argument('--widths', type=int, nargs=2, default=platWidths, help='range of platform widths')
+    parser.add_argument('--gaps', type=int, nargs=2, default=platGaps, help='range of gaps between platforms')
+    parser.add_argument('--workers', type=int, help='processes used, all cores by default')
+    parser.add_argument('--show', type=int, default=20, help='impossible gaps printed')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    checked, found, airtimes = fuzz(args.sequences, args.platforms, tuple(args.widths), tuple(args.gaps), args.first, args.workers)
+    took = time.perf_counter() - start
+    shortest, longest = min(airtimes), max(airtimes)
+    print('jump airtime %d to %d ticks, %d to %d px of scrolling' % (shortest, longest, shortest*runSpeed, longest*runSpeed))
+    print('%d sequences of %d platforms in %.2f s (%.0f sequences/s)' % (checked, args.platforms, took, checked/took))
+    print('%d sequences with an impossible gap (%.4f%%)' % (len(found), 100*len(found)/max(checked, 1)))
+    if found:
+        print('smallest impossible gap %d px' % min(gap for seed, plat, gap, before, after in found))
+    for seed, plat, gap, before, after in found[:args.show]:
+        print('  seed %d platform %d: gap %d px after a %d px platform, next is %d px' % (seed, plat, gap, before, after))
@@ -0,0 +1,82 @@
+import queue
+import random
+import threading
+from Simulation import nextPlat, platGaps, platWidths
+
+chunkSize = 32 # platforms per chunk
+queueChunks = 4 # chunks generated ahead of the camera
+keptOpenings = 8 # opening chunks remembered for restarts
+
+# generates a run's platforms on a background thread in seeded chunks, the game only takes finished ones
+# platforms come from the same generator calls Simulation makes inline, so a seed gives the same level either way
+# opening chunks are kept by seed, and the next random run's opening is made ahead, so restarts start from a ready chunk
+class LevelStreamer:
+    def __init__(self, chunk=chunkSize, depth=queueChunks, widths=platWidths, gaps=platGaps):
+        self.chunk = chunk # platforms per chunk
+        self.depth = depth # most chunks waiting
+        self.widths = widths # range of platform widths
+        self.gaps = gaps # range of gaps
+        self.openings = {} # seed -> (first chunk, generator state after it), oldest first
+        self.lock = threading.Lock() # guards openings, producers make them too
+        self.spare = random.randrange(2**32) # seed the next random run gets
+        self.chunks = None # finished chunks of current run
+        self.stop = None # tells the current producer to finish
+        self.current = [] # chunk being taken from
+        self.index = 0 # next platform in it
+        self.waits = 0 # times the game had to wait for a chunk
+
+    # seed for a new random run, its opening is usually generated already
+    def nextSeed(self):
+        seed = self.spare
+        self.spare = random.randrange(2**32)
+        return seed
+
+    # first chunk of a seed and generator state after it, made once and kept
+    def opening(self, seed):
+        with self.lock:
+            if seed in self.openings:
+                return self.openings[seed]
+        rng = random.Random(seed)
+        made = ([nextPlat(rng, self.widths, self.gaps) for i in range(self.chunk)], rng.getstate())
+        with self.lock:
+            self.openings[seed] = made
+            if len(self.openings) > keptOpenings: # forgets the oldest
+                del self.openings[next(iter(self.openings))]
+        return made
+
+    # starts streaming a run's level, stopping the previous run's producer
+    def start(self, seed):
+        if self.stop is not None:
+            self.stop.set()
+        self.current, state = self.opening(seed)
+        self.index = 0
+        rng = random.Random()
+        rng.setstate(state)
+        self.chunks = queue.Queue(self.depth)
+        self.stop = threading.Event()
+        threading.Thread(target=self.produce, args=(rng, self.chunks, self.stop), daemon=True).start()
+
+    # producer thread, fills the queue and makes the opening of the next random run
+    def produce(self, rng, chunks, stop):
+        while not stop.is_set():
+            chunk = [nextPlat(rng, self.widths, self.gaps) for i in range(self.chunk)]
+            while not stop.is_set():
+                try:
+                    chunks.put(chunk, timeout=0.1) # wakes now and then to notice a restart
+                    break
+                except queue.Full:
+                    pass
+            self.opening(self.spare)
+
+    # gap and width of the next platform
+    def next(self):
+        if self.index >= len(self.current):
+            try:
+                self.current = self.chunks.get_nowait()
+            except queue.Empty: # producer fell behind
+                self.waits += 1
+                self.current = self.chunks.get()
+            self.index = 0
+        plat = self.current[self.index]
+        self.index += 1
+        return plat
@@ -0,0 +1,117 @@
+import csv
+import json
+import time
+from collections import deque
+import pygame
+from Renderer import TextCache
+
+# colors of stages in the overlay graph
+stageColors = {
+    'events': (200,200,200), 'scenery.update': (90,160,255), 'sim.step': (255,80,80),
+    'queue': (255,160,0), 'scenery': (60,200,120), 'platforms': (140,90,60), 'entities': (255,200,120),
+    'score': (230,230,80), 'ghosts': (140,200,255), 'player': (240,120,220), 'menu': (120,220,220), 'profiler': (90,90,90), 'display': (160,90,255), 'scale': (255,255,255),
+}
+
+# times the stages of recent frames in a ring buffer, draws them as a graph and exports them
+# stages are marked in order, each mark ends the previous stage
+class FrameProfiler:
+    def __init__(self, frames=600, budget=1/120):
+        self.frames = deque(maxlen=frames) # finished frames, oldest first
+        self.budget = budget # seconds a frame may take
+        self.current = None # frame being timed, [start, spans], spans are (name, start, seconds, depth)
+        self.stageName = None # stage being timed
+        self.stageStart = 0 # when it started
+        self.visible = False # overlay is shown
+        self.text = TextCache(32) # legend text
+
+    # starts timing a frame
+    def beginFrame(self):
+        now = time.perf_counter()
+        self.current = [now, []]
+        self.stageName = None
+
+    # ends current stage and starts timing a new one, ignored outside a frame
+    def mark(self, name):
+        if self.current is None:
+            return
+        now = time.perf_counter()
+        if self.stageName is not None:
+            self.current[1].append((self.stageName, self.stageStart, now - self.stageStart, 0))
+        self.stageName = name
+        self.stageStart = now
+
+    # adds drawing times measured by the renderer inside the current stage, one after another
+    def nest(self, times):
+        if self.current is None or self.stageName is None:
+            return
+        start = self.stageStart
+        for stage, seconds in times.items():
+            self.current[1].append((stage or 'other', start, seconds, 1))
+            start += seconds
+
+    # ends current stage and stores the frame
+    def endFrame(self):
+        self.mark(None)
+        if self.current is not None:
+            self.frames.append(self.current)
+        self.current = None
+
+    # average seconds spent in each stage over the last frames
+    def averages(self, count=60):
+        frames = list(self.frames)[-count:]
+        totals = {}
+        for frame in frames:
+            for name, start, took, depth in frame[1]:
+                totals[name] = totals.get(name, 0) + took
+        return {name: total/len(frames) for name, total in totals.items()}
+
+    # shows or hides overlay
+    def toggle(self):
+        self.visible = not self.visible
+
+    # graph of recent frames, one stacked bar per frame with a line at the frame budget
+    def overlay(self, width=360, height=150):
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0,0,0,170))
+        scale = (height*0.6) / self.budget # pixels per second, budget sits at 60% height
+        frames = list(self.frames)[-(width-120):]
+        for x, frame in enumerate(frames):
+            y = height
+            for name, start, took, depth in frame[1]:
+                if depth == 0 and name in ('wait', 'idle', 'present'): # present is drawn as its nested stages
+                    continue
+                bar = int(took*scale)
+                if bar > 0:
+                    pygame.draw.line(surface, stageColors.get(name, (255,255,255)), (x, y), (x, y-bar))
+                    y -= bar
+        budgetY = height - int(self.budget*scale)
+        pygame.draw.line(surface, (255,0,0), (0, budgetY), (width-121, budgetY)) # frame budget
+
+        y = 2
+        for name, took in sorted(self.averages().items(), key=lambda item: -item[1]):
+            if name in ('wait', 'idle', 'present'):
+                continue
+            label = self.text.render('%s %.2f' % (name, took*1000), 16, stageColors.get(name, (255,255,255)))
+            surface.blit(label, (width-118, y))
+            y += 12
+        return surface
+
+    # writes frames as chrome trace json, open it in chrome://tracing or perfetto
+    def exportTrace(self, path):
+        events = []
+        for number, frame in enumerate(self.frames):
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': frame[0]*1e6,
+                           'dur': sum(span[2] for span in frame[1] if span[3] == 0)*1e6, 'args': {'frame': number}})
+            for name, start, took, depth in frame[1]:
+                events.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': start*1e6, 'dur': took*1e6})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    # writes frames as csv, one row per stage
+    def exportCsv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'stage', 'depth', 'start_ms', 'duration_ms'])
+            for number, frame in enumerate(self.frames):
+                for name, start, took, depth in frame[1]:
+                    writer.writerow([number, name, depth, '%.3f' % ((start-frame[0])*1000), '%.3f' % (took*1000)])
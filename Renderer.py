@@ -0,0 +1,333 @@
+import math
+import time
+import weakref
+from collections import OrderedDict
+import pygame
+
+# collects a frame's draw calls and pushes them to the display
+# full mode redraws and updates the whole window when the frame changed, dirty mode redraws and updates only regions that changed
+# draw calls use logical coordinates of size, they are drawn on a canvas at the internal resolution which is scaled to the window
+# the logical frame is scaled to fit inside the canvas and centered, windows of another shape get black bars
+class Renderer:
+    def __init__(self, screen, dirty=False, size=None):
+        self.screen = screen # window surface
+        self.dirty = dirty # use dirty rectangle mode
+        self.size = size or screen.get_size() # logical size draw calls are placed in
+        self.scale = 1 # internal resolution as a share of the window
+        self.canvas = screen # surface frames are drawn on, the window itself when no scaling is needed
+        self.factor = 1 # canvas pixels per logical pixel
+        self.frame = screen.get_rect() # canvas rect the logical frame is drawn in
+        self.offset = (0, 0) # canvas pixels left of and above the logical frame
+        self.bars = [] # canvas rects around the logical frame
+        self.whole = True # next present draws and sends the whole canvas
+        self.scaled = weakref.WeakKeyDictionary() # surfaces resized for the current internal resolution
+        self.bounds = weakref.WeakKeyDictionary() # visible area of trimmed surfaces
+        self.drawList = [] # draw calls of the current frame
+        self.lastList = [] # draw calls on the display, keeps their surfaces alive
+        self.changed = True # draw calls were added since last present
+        self.overlay = None # draw call kept on top of every frame until removed
+        self.stage = None # name of the part of the frame being queued, set by the caller
+        self.stageTimes = None # seconds spent drawing each stage, only measured when set to a dict
+        self.setScale(1)
+
+    # sets internal resolution as a share of the window size, images are resized again as they are drawn
+    def setScale(self, scale):
+        width, height = self.screen.get_size()
+        size = (max(1, round(width*scale)), max(1, round(height*scale)))
+        self.scale = scale
+        self.canvas = self.screen if size == (width, height) else pygame.Surface(size, 0, self.screen)
+        self.factor = min(size[0] / self.size[0], size[1] / self.size[1])
+        frame = pygame.Rect(0, 0, round(self.size[0]*self.factor), round(self.size[1]*self.factor))
+        frame.center = (size[0]//2, size[1]//2)
+        self.frame = frame
+        self.offset = frame.topleft
+        self.bars = [rect for rect in (pygame.Rect(0, 0, size[0], frame.top), pygame.Rect(0, frame.bottom, size[0], size[1]-frame.bottom),
+                                       pygame.Rect(0, 0, frame.left, size[1]), pygame.Rect(frame.right, 0, size[0]-frame.right, size[1])) if rect.width > 0 and rect.height > 0]
+        self.scaled = weakref.WeakKeyDictionary()
+        self.invalidate()
+
+    # logical rectangle in canvas pixels, grown to whole pixels
+    def toPixels(self, rect):
+        factor, (x, y) = self.factor, self.offset
+        if factor == 1:
+            return pygame.Rect(rect).move(x, y)
+        left, top = math.floor(rect[0]*factor), math.floor(rect[1]*factor)
+        return pygame.Rect(left+x, top+y, math.ceil((rect[0]+rect[2])*factor) - left, math.ceil((rect[1]+rect[3])*factor) - top)
+
+    # window position in logical coordinates, for mouse input
+    def toLogical(self, pos):
+        width, height = self.screen.get_size()
+        factor = min(width / self.size[0], height / self.size[1]) # window pixels per logical pixel
+        x = (width - self.size[0]*factor) / 2
+        y = (height - self.size[1]*factor) / 2
+        return (int((pos[0] - x) / factor), int((pos[1] - y) / factor))
+
+    # surface resized for the canvas, made once per internal resolution
+    def resized(self, surface):
+        if self.factor == 1:
+            return surface
+        copy = self.scaled.get(surface)
+        if copy is None:
+            width, height = surface.get_size()
+            size = (max(1, round(width*self.factor)), max(1, round(height*self.factor)))
+            try:
+                copy = pygame.transform.smoothscale(surface, size)
+            except ValueError: # smoothscale needs 24 or 32 bit surfaces
+                copy = pygame.transform.scale(surface, size)
+            if surface.get_flags() & pygame.SRCALPHA and pygame.mask.from_surface(surface, 254).count() == width*height:
+                copy = copy.convert() # smoothing rounds opaque alpha down, which would let the frame below show through
+            self.scaled[surface] = copy
+        return copy
+
+    # remembers the visible area of a large, mostly transparent surface
+    def trim(self, surface):
+        self.bounds[surface] = surface.get_bounding_rect()
+        return surface
+
+    # starts a new frame, overlays can be drawn on top of the last frame by not calling this
+    def beginScene(self):
+        self.drawList = []
+        self.changed = True
+
+    # queues an image to be drawn at pos
+    def blit(self, surface, pos):
+        self.drawList.append((surface, (int(pos[0]), int(pos[1])), self.stage))
+        self.changed = True
+
+    # makes next present send the whole frame, for when the window lost its contents
+    def invalidate(self):
+        self.lastList = []
+        self.changed = True
+        self.whole = True
+
+    # keeps an image on top of every frame, None removes it
+    def setOverlay(self, surface, pos=(0,0)):
+        if surface is None and self.overlay is None:
+            return
+        self.overlay = (surface, (int(pos[0]), int(pos[1])), 'profiler') if surface is not None else None
+        self.changed = True
+
+    # draw calls of the frame with the overlay on top
+    def items(self):
+        if self.overlay is None:
+            return self.drawList
+        return self.drawList + [self.overlay]
+
+    # queues a filled rectangle
+    def fill(self, color, rect):
+        self.drawList.append((tuple(color), pygame.Rect(rect), self.stage))
+        self.changed = True
+
+    # logical area touched by a draw call
+    def area(self, item):
+        what, where, stage = item
+        screen = pygame.Rect((0,0), self.size)
+        if isinstance(where, pygame.Rect): # filled rectangle
+            return where.clip(screen)
+        if what in self.bounds: # trimmed surface
+            return self.bounds[what].move(where).clip(screen)
+        return pygame.Rect(where, what.get_size()).clip(screen)
+
+    # identity of a draw call, surfaces are compared by object since lastList keeps them alive
+    def key(self, item):
+        what, where, stage = item
+        if isinstance(where, pygame.Rect):
+            return (what, tuple(where))
+        return (id(what), where)
+
+    # draws queued calls on the canvas, clipped to a logical area if given, returns the canvas pixels drawn
+    # images following each other in one stage go to the canvas in a single blits call
+    def draw(self, area=None):
+        canvas = self.canvas
+        factor = self.factor
+        x, y = self.offset
+        if area is None:
+            clip = self.frame
+            for bar in self.bars:
+                canvas.fill((0,0,0), bar)
+        else:
+            clip = self.toPixels(area).clip(self.frame)
+        canvas.set_clip(clip)
+        batch = [] # images waiting to be blitted
+        batchStage = None # their stage
+        for what, where, stage in self.items():
+            if batch and (stage != batchStage or isinstance(where, pygame.Rect)):
+                self.drawBatch(batch, batchStage)
+                batch = []
+            if isinstance(where, pygame.Rect):
+                if self.stageTimes is not None:
+                    start = time.perf_counter()
+                canvas.fill(what, self.toPixels(where))
+                if self.stageTimes is not None:
+                    self.stageTimes[stage] = self.stageTimes.get(stage, 0) + time.perf_counter() - start
+            elif factor == 1:
+                batch.append((what, (where[0]+x, where[1]+y)))
+            else:
+                batch.append((self.resized(what), (round(where[0]*factor)+x, round(where[1]*factor)+y)))
+            batchStage = stage
+        if batch:
+            self.drawBatch(batch, batchStage)
+        canvas.set_clip(None)
+        return clip
+
+    # blits images of one stage at once
+    def drawBatch(self, batch, stage):
+        if self.stageTimes is not None:
+            start = time.perf_counter()
+        self.canvas.blits(batch, False)
+        if self.stageTimes is not None:
+            self.stageTimes[stage] = self.stageTimes.get(stage, 0) + time.perf_counter() - start
+
+    # stretches the canvas over the window and sends canvas rects to the display, the whole window when None
+    def show(self, rects=None):
+        if self.canvas is not self.screen:
+            if self.stageTimes is not None:
+                start = time.perf_counter()
+            pygame.transform.scale(self.canvas, self.screen.get_size(), self.screen) # nearest pixel, smoothing the whole window costs more than it saves
+            if self.stageTimes is not None:
+                self.stageTimes['scale'] = self.stageTimes.get('scale', 0) + time.perf_counter() - start
+        if rects is None:
+            self.update()
+        elif self.canvas is self.screen:
+            self.update(rects)
+        else:
+            self.update([self.stretched(rect) for rect in rects])
+
+    # window pixels showing a canvas rect once stretched, a pixel wider on each side since nearest scaling may round either way
+    def stretched(self, rect):
+        width, height = self.screen.get_size()
+        sx, sy = width / self.canvas.get_width(), height / self.canvas.get_height()
+        left, top = math.floor(rect.left*sx) - 1, math.floor(rect.top*sy) - 1
+        return pygame.Rect(left, top, math.ceil(rect.right*sx) + 1 - left, math.ceil(rect.bottom*sy) + 1 - top).clip(self.screen.get_rect())
+
+    # sends drawn regions to the display, timed as its own stage
+    def update(self, rects=None):
+        if self.stageTimes is not None:
+            start = time.perf_counter()
+        if rects is None:
+            pygame.display.update() # updates display
+        else:
+            pygame.display.update(rects) # updates only changed regions
+        if self.stageTimes is not None:
+            self.stageTimes['display'] = self.stageTimes.get('display', 0) + time.perf_counter() - start
+
+    # returns drawing time of each stage since last call and starts measuring again
+    def takeStageTimes(self):
+        times = self.stageTimes
+        self.stageTimes = {}
+        return times or {}
+
+    # merges overlapping rectangles so each region is redrawn once
+    def merge(self, rects):
+        merged = []
+        for rect in rects:
+            i = 0
+            while i < len(merged): # absorbs every merged rectangle this one touches
+                if rect.colliderect(merged[i]):
+                    rect = rect.union(merged.pop(i))
+                    i = 0
+                else:
+                    i += 1
+            merged.append(rect)
+        return merged
+
+    # sends the frame to the display
+    def present(self):
+        if not self.changed: # nothing was drawn this frame
+            return
+        self.changed = False
+        items = self.items()
+        if not self.dirty:
+            if [self.key(item) for item in items] == [self.key(item) for item in self.lastList]: # same frame is already on the display
+                return
+            self.lastList = list(items)
+            self.draw()
+            self.show()
+            return
+
+        if self.whole: # window lost its contents or bars were never drawn
+            self.whole = False
+            self.lastList = list(items)
+            self.draw()
+            self.show()
+            return
+        current = {self.key(item) for item in items}
+        previous = {self.key(item) for item in self.lastList}
+        rects = [self.area(item) for item in items if self.key(item) not in previous]
+        rects += [self.area(item) for item in self.lastList if self.key(item) not in current]
+        self.lastList = list(items)
+        if self.factor != 1: # resized images are placed and sized by rounding, which can reach a canvas pixel past their area
+            pad = math.ceil(1/self.factor)
+            screen = pygame.Rect((0,0), self.size)
+            rects = [rect.inflate(2*pad, 2*pad).clip(screen) for rect in rects if rect.width and rect.height]
+        rects = self.merge([rect for rect in rects if rect.width and rect.height])
+        drawn = [self.draw(rect) for rect in rects]
+        if drawn:
+            self.show(drawn)
+
+# picks internal resolution from frame times, lower when frames take longer than budget and higher when there is headroom
+# averages a window of frames between decisions and ignores the window after a change, which pays for resizing images
+class ResolutionController:
+    def __init__(self, budget, lowest=0.5, highest=1, step=0.125, frames=30, patience=3):
+        self.budget = budget # seconds a frame may take
+        self.lowest = min(lowest, highest) # smallest scale, never above the largest
+        self.highest = highest # largest scale, also the starting one
+        self.step = step # change of scale per decision
+        self.frames = frames # frames averaged per decision
+        self.patience = patience # windows with headroom in a row needed to raise scale
+        self.scale = highest # current scale
+        self.samples = [] # busy seconds of frames in the current window
+        self.settling = False # current window follows a change and is ignored
+        self.calm = 0 # windows with headroom in a row
+
+    # adds seconds a frame was busy, returns the new scale when it should change, otherwise None
+    def update(self, busy):
+        self.samples.append(busy)
+        if len(self.samples) < self.frames:
+            return None
+        average = sum(self.samples) / len(self.samples)
+        self.samples = []
+        if self.settling:
+            self.settling = False
+            return None
+        scale = self.scale
+        if average > self.budget*0.9: # about to miss frames
+            self.calm = 0
+            scale = max(self.lowest, self.scale - self.step)
+        elif average < self.budget*0.5:
+            self.calm += 1
+            if self.calm >= self.patience:
+                self.calm = 0
+                scale = min(self.highest, self.scale + self.step)
+        else:
+            self.calm = 0
+        if scale == self.scale:
+            return None
+        self.scale = scale
+        self.settling = True
+        return scale
+
+# builds each font size once and keeps recently rendered strings
+class TextCache:
+    def __init__(self, limit=64):
+        self.limit = limit # most rendered strings kept
+        self.fonts = {} # font per size
+        self.surfaces = OrderedDict() # rendered strings, least recently used first
+
+    # gets font of given size, building it on first use
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.Font(None, size)
+        return self.fonts[size]
+
+    # gets text rendered in given size and color
+    def render(self, text, size, color):
+        key = (text, size, tuple(color))
+        if key in self.surfaces:
+            self.surfaces.move_to_end(key) # mark as recently used
+            return self.surfaces[key]
+        surface = self.font(size).render(text, 1, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.limit: # drop least recently used
+            self.surfaces.popitem(last=False)
+        return surface
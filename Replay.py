@@ -0,0 +1,98 @@
+import sys
+import time
+import struct
+from Simulation import Simulation, jumpPress, jumpRelease
+
+# replay file: header followed by one varint per input event
+# each varint holds ticks since the previous event shifted left once, low bit set for a release
+magic = b'RNR1'
+header = struct.Struct('<4sQIIII') # magic, seed, lookahead, ticks, score, event count
+
+# appends an unsigned number as a little endian base 128 varint
+def writeVarint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+# reads a varint at pos, returns value and position after it
+def readVarint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+# records the inputs of one run
+class Recorder:
+    def __init__(self, seed, lookahead):
+        self.seed = seed # level seed of the run
+        self.lookahead = lookahead # platforms the simulation buffers
+        self.events = bytearray() # encoded events
+        self.count = 0 # amount of events
+        self.lastTick = 0 # tick of previous event
+
+    # records inputs given on a tick of the run
+    def record(self, tick, inputs):
+        for event in inputs:
+            writeVarint(self.events, (tick - self.lastTick) << 1 | (event == jumpRelease))
+            self.lastTick = tick
+            self.count += 1
+
+    # encodes finished run, ticks and score let playback check it reproduced the run
+    def finish(self, ticks, score):
+        return header.pack(magic, self.seed, self.lookahead, ticks, score, self.count) + bytes(self.events)
+
+# a recorded run read back from its bytes
+class Replay:
+    def __init__(self, data):
+        tag, self.seed, self.lookahead, self.ticks, self.score, count = header.unpack_from(data)
+        if tag != magic:
+            raise ValueError('not a replay file')
+        self.events = {} # inputs by tick
+        pos = header.size
+        tick = 0
+        for i in range(count):
+            value, pos = readVarint(data, pos)
+            tick += value >> 1
+            self.events.setdefault(tick, []).append(jumpRelease if value & 1 else jumpPress)
+
+    # reads a replay file
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    # inputs to give on a tick of the run
+    def inputs(self, tick):
+        return self.events.get(tick, ())
+
+    # plays the run headless as fast as possible, returns the finished simulation
+    def play(self):
+        sim = Simulation(self.lookahead, self.seed)
+        while not sim.isOver() and sim.runTicks() <= self.ticks:
+            sim.step(self.inputs(sim.runTicks()))
+        return sim
+
+    # checks that playing the run gives the recorded result
+    def verify(self):
+        sim = self.play()
+        return sim.runTicks() == self.ticks and sim.score == self.score
+
+# plays replay files at maximum speed and reports any that no longer reproduce
+if __name__ == '__main__':
+    failed = 0
+    ticks = 0
+    start = time.perf_counter()
+    for path in sys.argv[1:]:
+        replay = Replay.open(path)
+        if not replay.verify():
+            print('mismatch', path)
+            failed += 1
+        ticks += replay.ticks
+    took = time.perf_counter() - start
+    print('%d replays, %d failed, %d ticks in %.2f s (%.0f ticks/s)' % (len(sys.argv)-1, failed, ticks, took, ticks/max(took, 1e-9)))
+    sys.exit(1 if failed else 0)
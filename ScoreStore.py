@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import queue
+import shelve
+import atexit
+import threading
+
+# append-only history of runs, written by a background thread so the game never waits on storage
+# each run is one json line, a line torn by a crash mid-write is skipped when loading
+class ScoreStore:
+    def __init__(self, path='assets/score/history.jsonl', legacy='assets/score/scorefile'):
+        self.path = path # history file
+        self.replayDir = os.path.join(os.path.dirname(path), 'replays') # recorded inputs of each run
+        self.runs = [] # every recorded run, oldest first
+        if os.path.exists(path):
+            self.load()
+        else:
+            self.migrate(legacy)
+
+        self.pending = queue.Queue() # runs waiting to be written, None stops the worker
+        self.worker = threading.Thread(target=self.write, daemon=True)
+        self.worker.start()
+        atexit.register(self.close) # writes what is left when the game exits
+
+    # reads history, skipping lines that were not fully written
+    def load(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    self.runs.append(json.loads(line))
+                except ValueError: # torn line
+                    pass
+
+    # creates history from the highscore kept in the old shelve file
+    def migrate(self, legacy):
+        try:
+            d = shelve.open(legacy, 'r') # open score file
+            score = d.get('score', 0)
+            d.close() # close score file
+        except Exception: # no old score file
+            score = 0
+        if score > 0:
+            self.runs.append({'score': score, 'duration': None, 'time': None, 'seed': None})
+        temp = self.path + '.tmp'
+        with open(temp, 'w') as f: # written aside and renamed so a crash never leaves half a file
+            for run in self.runs:
+                f.write(json.dumps(run) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+
+    # worker thread, appends queued runs to history
+    def write(self):
+        with open(self.path, 'ab+') as f:
+            if f.seek(0, os.SEEK_END) > 0: # a torn last line gets its own line so the next run stays readable
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+            while True:
+                item = self.pending.get()
+                if item is None:
+                    break
+                run, replay, ghost = item
+                if replay is not None: # replay is complete on disk before history points to it
+                    os.makedirs(self.replayDir, exist_ok=True)
+                    with open(self.replayPath(run), 'wb') as r:
+                        r.write(replay)
+                if ghost is not None:
+                    os.makedirs(self.replayDir, exist_ok=True)
+                    with open(self.ghostPath(run), 'wb') as g:
+                        g.write(ghost)
+                f.write((json.dumps(run) + '\n').encode()) # one write per run
+                f.flush()
+                os.fsync(f.fileno())
+
+    # queues a finished run, returns immediately, replay and ghost bytes are saved next to history
+    def record(self, score, duration, seed=None, replay=None, ghost=None):
+        run = {'score': score, 'duration': duration, 'time': time.time(), 'seed': seed}
+        if replay is not None:
+            run['replay'] = '%d-%d.rnr' % (run['time']*1000, seed)
+        if ghost is not None:
+            run['ghost'] = '%d-%d.gst' % (run['time']*1000, seed)
+        self.runs.append(run)
+        self.pending.put((run, replay, ghost))
+
+    # path of a run's replay file, None if it has none
+    def replayPath(self, run):
+        if 'replay' not in run:
+            return None
+        return os.path.join(self.replayDir, run['replay'])
+
+    # path of a run's ghost file, None if it has none
+    def ghostPath(self, run):
+        if 'ghost' not in run:
+            return None
+        return os.path.join(self.replayDir, run['ghost'])
+
+    # best score ever recorded
+    def highscore(self):
+        return max([run['score'] for run in self.runs], default=0)
+
+    # n best runs, highest score first
+    def top(self, n=10):
+        return sorted(self.runs, key=lambda run: run['score'], reverse=True)[:n]
+
+    # waits for queued runs to be written and stops the worker
+    def close(self):
+        if self.worker.is_alive():
+            self.pending.put(None)
+            self.worker.join()
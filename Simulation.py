@@ -0,0 +1,324 @@
+import bisect
+import random
+from array import array
+import pygame # only Rect and Sprite are used, importing opens no window
+from Entities import EntityLayer
+
+platBuffer = 5 # amount of platforms instantiated at once, the opening ones are all flat
+displayHeight = 720 # window height
+displayWidth = 1280 # window width
+runSpeed = 8 # movement speed
+tickRate = 120 # logic ticks per second
+playerFrames = 12 # amount of player animation images
+platWidths = (200,800) # range of random platform widths
+platGaps = (100,550) # range of random distances between platforms
+
+jumpPress = 'press' # input event, spacebar pressed
+jumpRelease = 'release' # input event, spacebar released
+
+# picks distance from the last platform and width of the next one
+def nextPlat(rng, widths=platWidths, gaps=platGaps):
+    width = rng.randint(*widths) # random platform width
+    return rng.randint(*gaps), width # random distance from the platform ahead
+
+# platforms player jumps on, stored in order as world positions in flat arrays
+# scrolling moves the camera instead of every platform, and lookups are binary searches
+class PlatformStore:
+    def __init__(self):
+        self.starts = array('q') # world x where each platform begins, increasing
+        self.ends = array('q') # world x where each platform ends
+        self.first = 0 # index of first platform still on screen
+        self.scroll = 0 # world distance scrolled
+        self.y = int(displayHeight/1.4) # top of every platform
+        self.height = int(displayHeight/2.5) # height of every platform
+
+    # removes every platform and rewinds the camera
+    def clear(self):
+        del self.starts[:]
+        del self.ends[:]
+        self.first = 0
+        self.scroll = 0
+
+    # amount of platforms on screen or ahead of it
+    def __len__(self):
+        return len(self.starts) - self.first
+
+    # adds a platform after the last one, gap is the distance from its end
+    def append(self, gap, width):
+        start = self.ends[-1] + gap if len(self.ends) > 0 else self.scroll
+        self.starts.append(start)
+        self.ends.append(start + width)
+
+    # moves every platform left
+    def update(self):
+        self.scroll += runSpeed
+
+    # drops platforms that passed left of screen, returns how many
+    def dropPassed(self):
+        dropped = 0
+        while self.first < len(self.ends) and self.ends[self.first] - self.scroll < 0:
+            self.first += 1
+            dropped += 1
+        if self.first > 64 and self.first*2 > len(self.starts): # compacts once most of the arrays are behind the camera
+            del self.starts[:self.first]
+            del self.ends[:self.first]
+            self.first = 0
+        return dropped
+
+    # gets screen position of beginning of a platform at index, counted from the first on screen
+    def platStart(self, index):
+        return self.starts[self.first+index] - self.scroll
+
+    # gets screen position of end of a platform at index
+    def platEnd(self, index):
+        return self.ends[self.first+index] - self.scroll
+
+    # gets index of platform under screen position x, None if x is over a gap
+    def under(self, x):
+        i = bisect.bisect_left(self.starts, x+self.scroll, self.first) - 1 # last platform beginning before x
+        if i >= self.first and self.ends[i] - self.scroll >= x:
+            return i - self.first
+        return None
+
+    # platforms that are on screen as rectangles, scroll places the camera somewhere else for drawing between ticks
+    def rects(self, scroll=None):
+        if scroll is None:
+            scroll = self.scroll
+        for i in range(self.first, len(self.starts)):
+            x = self.starts[i] - scroll
+            if x >= displayWidth:
+                break
+            yield pygame.Rect(x, self.y, self.ends[i]-self.starts[i], self.height)
+
+# player physics, the renderer assigns self.image before drawing
+class Player(pygame.sprite.Sprite):
+    def __init__(self):
+        super().__init__() # call parent constructor
+        self.jumping = False # on platform or in air
+        self.holding = False # holding jump key
+        self.dead = False # if player fell or not
+        self.groundDelay = 4 # ground animation speed in ticks
+        self.airDelay = 12 # air animation speed in ticks
+        self.animDelay = self.groundDelay # initialize animation speed
+        self.animTicks = 0 # ticks since last animation frame
+
+        self.rect = pygame.Rect(100, 428, 75, 100) # initialize player position
+        self.pIndex = 0 # initializes current sprite image index
+        self.move_x = 0 # rate of moving on x axis
+        self.move_y = 0 # rate of moving on y axis
+
+    # updates player traits, called once per tick
+    def update(self, gap):
+        self.rect.y += self.move_y # changes player y position
+        self.rect.x += self.move_x # changes player x position
+        if self.holding and self.move_y < 0: # if holding jump and moving upwards
+            self.gravity(gap, 0.25) # lower gravity
+        else: # falling
+            self.gravity(gap, 0.55) # normal gravity
+
+        # set animation delay
+        if not self.jumping and not self.dead and self.animDelay != self.groundDelay: # moving on platform
+            self.animDelay = self.groundDelay
+        elif self.animDelay != self.airDelay: # moving in air
+            self.animDelay = self.airDelay
+
+        self.animTicks += 1
+        if self.animTicks >= self.animDelay: # animation speed
+            self.pIndex = (self.pIndex+1) % playerFrames # changes to next image
+            self.animTicks = 0 # reset timer
+
+    # sets gravity for different scenarios
+    def gravity(self, gap, grav):
+        if (gap or self.jumping) and not self.dead: # if player is in the air
+            self.move_y += grav # sets downward move rate
+            if self.rect.y >= 428: # if player is level or below top of platforms
+                if gap: # player is not on a platform
+                    self.die()
+                else: # player is on platform
+                    self.rect.y = 428 # saftey, ensures player stays level with top of platforms
+                    self.move_y = 0 # not moving up or down
+                self.jumping = False # not jumping
+        if self.move_y > 10: # fall rate limit
+            self.move_y = 10
+
+    # adds upward movement rate when called
+    def jump(self):
+        if not self.jumping and not self.dead: # player is not currently jumping and not dead
+            self.move_y = -10 # sets rate of moving
+            self.jumping = True # sets jump state as true when called
+
+    # player stops running and falls with the platforms
+    def die(self):
+        self.move_x = -runSpeed # player moves with platforms
+        self.move_y = 10 # player falls fast
+        self.dead = True # player is dead
+        self.jumping = False
+
+    # stores state of player holding key
+    def holdKey(self, holding):
+        self.holding = holding
+
+    # returns if player is dead
+    def isDead(self):
+        return self.dead
+
+    # resets player variables for new game
+    def resetPlayer(self):
+        self.dead = False
+        self.jumping = False
+        self.holding = False
+        self.rect.x = 100
+        self.rect.y = 428
+        self.move_y = 0
+        self.move_x = 0
+
+# moving background scenery, kept apart from Simulation since the menu scrolls it too
+class Scenery:
+    def __init__(self, farWidth, closeWidth, seed=None):
+        self.rng = random.Random(seed) # own generator so scenery never shifts level generation
+        self.farWidth = farWidth # width of further buildings image
+        self.closeWidth = closeWidth # width of closer buildings image
+        self.buildingsFar1Pos = 0 # initialize further buildings image x position
+        self.buildingsFar2Pos = farWidth # initialize second further buildings image x position
+        self.buildingsClose1Pos = 0 # initialize closer buildings image x position
+        self.buildingsClose2Pos = closeWidth # initialize second closer buildings image x position
+        self.shipX = -200 # initialize moving ship's x position
+        self.shipY = 150 # initialize moving ship's y position
+        self.shipSpeed = 10 # initialize moveing ship's speed
+        self.laserTicks = 0 # ticks since background lasers flickered
+        self.lasersVisible = False # are background lasers drawn this tick
+        self.shipLaserTicks = 0 # ticks since ship's laser switched direction
+        self.laserIndex = self.rng.randrange(4) # direction of moving ship's laser
+
+    # restarts random ship and laser choices from seed
+    def reseed(self, seed):
+        self.rng.seed(seed)
+
+    # stores and and moves positioning of background scenery
+    def update(self):
+        if self.buildingsFar1Pos <= -self.farWidth: # loops furthest buildings
+            self.buildingsFar1Pos = self.farWidth
+        if self.buildingsFar2Pos <= -self.farWidth: # loops furthest buildings
+            self.buildingsFar2Pos = self.farWidth
+        if self.buildingsClose1Pos <= -self.closeWidth: # loops closer buildings
+            self.buildingsClose1Pos = self.closeWidth
+        if self.buildingsClose2Pos <= -self.closeWidth: # loops closer buildings
+            self.buildingsClose2Pos = self.closeWidth
+        if self.shipX >= displayWidth: # loops moving ship
+            self.shipSpeed = self.rng.randint(2,10) # random ship speed
+            self.shipY = self.rng.randint(150,600) # random ship height
+            self.shipX = self.rng.randint(-3000,-100) # random reset point
+        self.buildingsFar1Pos -= 1 # move furthest buildings
+        self.buildingsFar2Pos -= 1 # move furthest buildings
+        self.buildingsClose1Pos -= 4 # move closer buildings
+        self.buildingsClose2Pos -= 4 # move closer buildings
+        self.shipX += self.shipSpeed # move ship
+
+        self.laserTicks += 1
+        self.lasersVisible = self.laserTicks > tickRate/10 # lasers show after a tenth of a second
+        if self.lasersVisible and self.laserTicks > self.rng.uniform(0,tickRate): # flashes lasers at random rate
+            self.laserTicks = 0
+        self.shipLaserTicks += 1
+        if self.shipLaserTicks > self.rng.uniform(0,tickRate*2): # flashes ship's lasers at random rate
+            self.shipLaserTicks = 0 # reset timer
+            self.laserIndex = self.rng.randrange(4) # chooses random laser direction
+
+# game state advanced one fixed tick per step(), needs no window or assets
+class Simulation:
+    def __init__(self, lookahead=platBuffer, seed=None, levels=None):
+        self.lookahead = max(lookahead, platBuffer) # amount of platforms kept on screen or ahead of it
+        self.player = Player() # instantiate player
+        self.platforms = PlatformStore() # initialize store for platforms
+        self.entities = EntityLayer() # pickups and obstacles, none are placed unless a level rule spawns them
+        self.rng = random.Random() # level generator, reseeded every run
+        self.levels = levels # LevelStreamer generating platforms ahead on a thread, None generates them here
+        self.tick = 0 # ticks stepped since creation
+        self.reset(seed)
+        self.player.update(self.gap) # first update
+
+    # resets variables to play from start, a run with the same seed and inputs plays out the same
+    def reset(self, seed=None):
+        if seed is None: # new random run
+            seed = self.levels.nextSeed() if self.levels else random.randrange(2**32)
+        self.seed = seed
+        if self.levels:
+            self.levels.start(seed) # same platforms as the generator below would give
+        else:
+            self.rng.seed(seed)
+        self.score = 0
+        self.startTick = self.tick # tick the run started on
+        self.deathTicks = 0 # ticks passed since player died
+        self.gap = False # keeps track of gaps between platforms
+        self.platforms.clear() # removes old platforms
+        self.entities.clear()
+        self.createPlats(platBuffer) # creates new platforms
+        self.player.resetPlayer()
+
+    # advances the game by one tick, inputs is a list of jumpPress/jumpRelease events
+    def step(self, inputs=()):
+        for event in inputs:
+            if event == jumpPress: # spacebar -> jump
+                self.player.holdKey(True) # user is holding spacebar
+                self.player.jump()
+            elif event == jumpRelease: # spacebar up
+                self.player.holdKey(False) # user released spacebar
+        if self.player.isDead():
+            self.deathTicks += 1
+
+        self.platforms.dropPassed() # platforms that passed left of screen
+        self.fillPlats() # replaces them ahead
+        self.platforms.update() # moves platforms
+
+        self.entities.dropPassed(self.platforms.scroll) # entities that passed left of screen go back to the pool
+
+        self.setGap()
+        self.player.update(self.gap)
+        self.touchEntities()
+        self.tick += 1
+
+    # game has ended once player has been dead for a second
+    def isOver(self):
+        return self.player.isDead() and self.deathTicks >= tickRate
+
+    # ticks played since last reset
+    def runTicks(self):
+        return self.tick - self.startTick
+
+    # seconds played since last reset
+    def duration(self):
+        return self.runTicks() / tickRate
+
+    # appends flat opening platforms back to back, then fills lookahead
+    def createPlats(self, buffer):
+        for i in range(buffer):
+            self.platforms.append(0, 400) # instantiates platforms back to back
+        self.fillPlats()
+
+    # adds platforms of random size and spacing until lookahead is full
+    def fillPlats(self):
+        while len(self.platforms) < self.lookahead:
+            gap, width = self.levels.next() if self.levels else nextPlat(self.rng)
+            self.platforms.append(gap, width) # places at end at random distance from the platform ahead
+
+    # places an entity at world position, x counts from the start of the run like platforms
+    def spawn(self, kind, x, y, width, height):
+        return self.entities.spawn(kind, (x, y, width, height))
+
+    # handles entities the player touches, pickups add to score and obstacles kill
+    def touchEntities(self):
+        if not self.entities or self.player.isDead():
+            return
+        for entity in self.entities.collide(self.player.rect.move(self.platforms.scroll, 0)): # player in world position
+            if entity.kind == 'pickup':
+                self.score += 1
+                self.entities.kill(entity)
+            elif entity.kind == 'obstacle':
+                self.player.die()
+                break
+
+    # determines if player is over a gap
+    def setGap(self):
+        gap = self.platforms.under(100) is None
+        if gap and not self.gap: # player completely passed a platform
+            self.score += 1 # increment score
+        self.gap = gap